@@ -1,19 +1,40 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, UploadFile, File, BackgroundTasks
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, UploadFile, File, BackgroundTasks, Query, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import FileResponse, StreamingResponse, ORJSONResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from starlette.background import BackgroundTask
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne, ASCENDING, DESCENDING, ReturnDocument
+from pymongo.errors import PyMongoError, BulkWriteError, DuplicateKeyError
 import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, EmailStr
-from typing import List, Optional
+from typing import List, Optional, Union
 import uuid
 from datetime import datetime, timezone, timedelta
 import jwt
 import bcrypt
 import httpx
+import io
+from PIL import Image, ImageOps
+from cachetools import TTLCache
+from sortedcontainers import SortedList
 import asyncio
+import time
+import json
+import base64
+import hashlib
+import mimetypes
+import re
+import unicodedata
+import math
+from urllib.parse import urlsplit, quote
+from email.utils import formatdate, parsedate_to_datetime
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import lru_cache
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -27,6 +48,8 @@ db = client[os.environ['DB_NAME']]
 JWT_SECRET = os.environ.get('JWT_SECRET', 'theadmins-secret-key-2024')
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRATION_HOURS = 24
+# Lifetime of the tickets that authenticate WebSocket and EventSource connections
+STREAM_TICKET_TTL = int(os.environ.get('STREAM_TICKET_TTL', 60))
 
 # Create the main app
 app = FastAPI(title="The Admins - Cybersecurity Mission System")
@@ -88,6 +111,22 @@ class UserResponse(BaseModel):
     rank_points: int = 0
     created_at: str
 
+class RankingEntry(BaseModel):
+    position: int
+    rank: int
+    user: UserResponse
+
+class RankingWindow(BaseModel):
+    total: int
+    entries: List[RankingEntry]
+
+class RankingPosition(BaseModel):
+    user_id: str
+    position: Optional[int] = None
+    rank: Optional[int] = None
+    rank_points: int = 0
+    total: int
+
 class UserUpdate(BaseModel):
     username: Optional[str] = None
     role: Optional[str] = None
@@ -117,6 +156,19 @@ class MissionResponse(BaseModel):
     completed_at: Optional[str] = None
     evidence: Optional[str] = None
 
+# Compact list row for fields=summary; the full document comes from GET /missions/{id}
+class MissionSummary(BaseModel):
+    id: str
+    title: str
+    target_url: str
+    category: str
+    priority: str
+    status: str
+    site_status: int = 0
+    assigned_username: Optional[str] = None
+    created_at: str
+    completed_at: Optional[str] = None
+
 class MissionUpdate(BaseModel):
     title: Optional[str] = None
     description: Optional[str] = None
@@ -143,6 +195,19 @@ class ReportResponse(BaseModel):
     created_at: str
     reviewed_at: Optional[str] = None
     evidence: Optional[str] = None
+    file_url: Optional[str] = None
+    file_name: Optional[str] = None
+
+# Compact list row for fields=summary; the full document comes from GET /reports/{id}
+class ReportSummary(BaseModel):
+    id: str
+    title: str
+    target_url: str
+    category: str
+    status: str
+    submitted_username: str
+    created_at: str
+    reviewed_at: Optional[str] = None
 
 # Tool Models
 class ToolCreate(BaseModel):
@@ -158,7 +223,6 @@ class ToolResponse(BaseModel):
     description: str
     category: str
     url: Optional[str] = None
-    file_path: Optional[str] = None
     is_file: bool
     created_by: str
     created_at: str
@@ -174,6 +238,9 @@ class ChatResponse(BaseModel):
     role: str = "externo"
     content: str
     image_url: Optional[str] = None
+    thumbnail_url: Optional[str] = None
+    image_width: Optional[int] = None
+    image_height: Optional[int] = None
     is_ai: bool
     created_at: str
 
@@ -186,14 +253,453 @@ class BadgeResponse(BaseModel):
     requirement_type: str
     requirement_value: int
 
+# ==================== INDEXES ====================
+
+# (collection, keys, options) for every hot query path; ensured on startup
+MONGO_INDEXES = [
+    ("users", [("id", ASCENDING)], {"unique": True}),
+    ("users", [("email", ASCENDING)], {"unique": True}),
+    ("users", [("username", ASCENDING)], {"unique": True}),
+    ("users", [("role", ASCENDING), ("rank_points", DESCENDING)], {}),
+    ("users", [("created_at", DESCENDING), ("id", DESCENDING)], {}),
+    ("missions", [("id", ASCENDING)], {"unique": True}),
+    ("missions", [("status", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], {}),
+    ("missions", [("category", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], {}),
+    ("missions", [("created_at", DESCENDING), ("id", DESCENDING)], {}),
+    ("missions", [("status", ASCENDING), ("next_check_at", ASCENDING)], {}),
+    ("missions", [("outbox.id", ASCENDING)], {"sparse": True}),
+    ("reports", [("id", ASCENDING)], {"unique": True}),
+    ("reports", [("submitted_by", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], {}),
+    ("reports", [("status", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], {}),
+    ("reports", [("created_at", DESCENDING), ("id", DESCENDING)], {}),
+    ("reports", [("blob_id", ASCENDING)], {}),
+    ("reports", [("outbox.id", ASCENDING)], {"sparse": True}),
+    ("tools", [("id", ASCENDING)], {"unique": True}),
+    ("tools", [("category", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], {}),
+    ("tools", [("created_at", DESCENDING), ("id", DESCENDING)], {}),
+    ("chat_messages", [("id", ASCENDING)], {"unique": True}),
+    ("chat_messages", [("created_at", DESCENDING), ("id", DESCENDING)], {}),
+    ("chat_messages", [("blob_id", ASCENDING)], {}),
+    ("chat_messages", [("thumbnail_blob_ids", ASCENDING)], {}),
+    ("notifications", [("user_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], {}),
+    ("notifications", [("user_id", ASCENDING), ("read", ASCENDING)], {}),
+    ("notifications", [("id", ASCENDING)], {"unique": True}),
+    ("user_badges", [("user_id", ASCENDING), ("badge_id", ASCENDING)], {"unique": True}),
+    ("jobs", [("id", ASCENDING)], {"unique": True}),
+    ("jobs", [("status", ASCENDING), ("run_at", ASCENDING)], {}),
+    ("jobs", [("status", ASCENDING), ("locked_until", ASCENDING)], {}),
+    ("jobs", [("expire_at", ASCENDING)], {"expireAfterSeconds": 0}),
+    ("rate_limits", [("expire_at", ASCENDING)], {"expireAfterSeconds": 0}),
+]
+
+# (name, collection, filter, sort) for the queries the API runs on every request
+HOT_QUERIES = [
+    ("users.by_id", "users", {"id": ""}, None),
+    ("users.by_email", "users", {"email": ""}, None),
+    ("users.by_username", "users", {"username": ""}, None),
+    ("users.list", "users", {}, [("created_at", DESCENDING), ("id", DESCENDING)]),
+    ("missions.by_id", "missions", {"id": ""}, None),
+    ("missions.list", "missions", {}, [("created_at", DESCENDING), ("id", DESCENDING)]),
+    ("missions.by_status", "missions", {"status": MissionStatus.PENDING}, [("created_at", DESCENDING), ("id", DESCENDING)]),
+    ("missions.by_category", "missions", {"category": MissionCategory.PHISHING}, [("created_at", DESCENDING), ("id", DESCENDING)]),
+    ("missions.due", "missions", {
+        "status": {"$in": [MissionStatus.PENDING, MissionStatus.IN_PROGRESS]},
+        "$or": [{"next_check_at": {"$lte": ""}}, {"next_check_at": None}]
+    }, [("next_check_at", ASCENDING)]),
+    ("reports.by_id", "reports", {"id": ""}, None),
+    ("reports.list", "reports", {}, [("created_at", DESCENDING), ("id", DESCENDING)]),
+    ("reports.by_submitter", "reports", {"submitted_by": ""}, [("created_at", DESCENDING), ("id", DESCENDING)]),
+    ("reports.by_status", "reports", {"status": ReportStatus.PENDING}, [("created_at", DESCENDING), ("id", DESCENDING)]),
+    ("tools.by_id", "tools", {"id": ""}, None),
+    ("tools.list", "tools", {}, [("created_at", DESCENDING), ("id", DESCENDING)]),
+    ("chat_messages.by_id", "chat_messages", {"id": ""}, None),
+    ("chat_messages.latest", "chat_messages", {}, [("created_at", DESCENDING), ("id", DESCENDING)]),
+    ("chat_messages.since", "chat_messages", {"$or": [
+        {"created_at": {"$gt": ""}},
+        {"created_at": "", "id": {"$gt": ""}}
+    ]}, [("created_at", ASCENDING), ("id", ASCENDING)]),
+    ("notifications.by_user", "notifications", {"user_id": ""}, [("created_at", DESCENDING)]),
+    ("notifications.unread", "notifications", {"user_id": "", "read": False}, None),
+    ("user_badges.by_user_badge", "user_badges", {"user_id": "", "badge_id": ""}, None),
+]
+
+async def ensure_indexes():
+    # A failing index (e.g. duplicates blocking a unique index) is logged without stopping startup
+    for collection, keys, options in MONGO_INDEXES:
+        try:
+            await db[collection].create_index(keys, **options)
+        except PyMongoError as e:
+            logger.error(f"Failed to create index {collection} {keys}: {str(e)}")
+
+async def migrate_chat_message_defaults():
+    # Older chat messages were stored without role/image_url; fill them in once so reads need no fix-ups
+    await db.chat_messages.update_many({"role": {"$exists": False}}, {"$set": {"role": UserRole.EXTERNO}})
+    await db.chat_messages.update_many({"image_url": {"$exists": False}}, {"$set": {"image_url": None}})
+
+async def migrate_unique_notification_ids():
+    # notifications.id was first indexed non-unique; drop duplicate rows and the old index so it can be rebuilt unique
+    duplicates = db.notifications.aggregate([
+        {"$group": {"_id": "$id", "keep": {"$first": "$_id"}, "n": {"$sum": 1}}},
+        {"$match": {"n": {"$gt": 1}}}
+    ])
+    async for duplicate in duplicates:
+        await db.notifications.delete_many({"id": duplicate["_id"], "_id": {"$ne": duplicate["keep"]}})
+    indexes = await db.notifications.index_information()
+    if "id_1" in indexes and not indexes["id_1"].get("unique"):
+        await db.notifications.drop_index("id_1")
+    await db.notifications.create_index([("id", ASCENDING)], unique=True)
+
+# One-off data migrations, applied once each and recorded in db.migrations
+MIGRATIONS = [
+    ("chat_message_defaults", migrate_chat_message_defaults),
+    ("unique_notification_ids", migrate_unique_notification_ids),
+]
+
+async def run_migrations():
+    applied = {doc["_id"] async for doc in db.migrations.find({}, {"_id": 1})}
+    for name, migration in MIGRATIONS:
+        if name in applied:
+            continue
+        try:
+            await migration()
+            await db.migrations.update_one(
+                {"_id": name},
+                {"$setOnInsert": {"applied_at": datetime.now(timezone.utc).isoformat()}},
+                upsert=True
+            )
+            logger.info(f"Applied migration {name}")
+        except PyMongoError as e:
+            logger.error(f"Migration {name} failed: {str(e)}")
+
+def _plan_stages(plan: dict) -> List[str]:
+    stages = [plan.get("stage", "")]
+    for child_key in ("inputStage", "queryPlan"):
+        if isinstance(plan.get(child_key), dict):
+            stages.extend(_plan_stages(plan[child_key]))
+    for child in plan.get("inputStages", []):
+        stages.extend(_plan_stages(child))
+    return stages
+
+async def explain_hot_queries() -> List[dict]:
+    report = []
+    for name, collection, query, sort in HOT_QUERIES:
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = await cursor.limit(1).explain()
+        stages = _plan_stages(explain.get("queryPlanner", {}).get("winningPlan", {}))
+        report.append({
+            "query": name,
+            "collection": collection,
+            "stages": stages,
+            "indexed": "COLLSCAN" not in stages
+        })
+    return report
+
+# ==================== PAGINATION ====================
+
+# List endpoints return one page as a plain list; the cursor for the next page, if any,
+# is sent in the X-Next-Cursor response header
+PAGE_SIZE_DEFAULT = int(os.environ.get('PAGE_SIZE_DEFAULT', 100))
+PAGE_SIZE_MAX = int(os.environ.get('PAGE_SIZE_MAX', 500))
+PAGE_SORT = [("created_at", DESCENDING), ("id", DESCENDING)]
+PAGE_SORT_ASC = [("created_at", ASCENDING), ("id", ASCENDING)]
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def keyset_query(anchor: dict, operator: str) -> dict:
+    # Documents strictly after ("$gt") or before ("$lt") the anchor in (created_at, id) order
+    return {"$or": [
+        {"created_at": {operator: anchor["created_at"]}},
+        {"created_at": anchor["created_at"], "id": {operator: anchor["id"]}}
+    ]}
+
+def encode_cursor(doc: dict) -> str:
+    raw = json.dumps([doc["created_at"], doc["id"]]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, doc_id = json.loads(raw)
+        if not isinstance(created_at, str) or not isinstance(doc_id, str):
+            raise ValueError
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return created_at, doc_id
+
+async def fetch_page(collection, query: dict, projection: dict, cursor: Optional[str], limit: int, response: Response) -> List[dict]:
+    if cursor:
+        created_at, doc_id = decode_cursor(cursor)
+        query = {**query, **keyset_query({"created_at": created_at, "id": doc_id}, "$lt")}
+    
+    docs = await collection.find(query, projection).sort(PAGE_SORT).limit(limit + 1).to_list(limit + 1)
+    if len(docs) > limit:
+        docs = docs[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(docs[-1])
+    return docs
+
+# ==================== FAST LIST RESPONSES ====================
+
+# List endpoints project exactly the response model's fields in Mongo and hand the
+# documents straight to orjson, skipping the per-document model build and FastAPI's second
+# validation pass. The models stay as response_model for the OpenAPI schema. Test runs set
+# VALIDATE_LIST_RESPONSES=true to push every document through its model again.
+VALIDATE_LIST_RESPONSES = os.environ.get('VALIDATE_LIST_RESPONSES', 'false').lower() == 'true'
+
+def model_projection(model) -> dict:
+    return {"_id": 0, **{name: 1 for name in model.model_fields}}
+
+@lru_cache(maxsize=None)
+def model_defaults(model) -> tuple:
+    return tuple((name, field.default) for name, field in model.model_fields.items() if not field.is_required())
+
+def list_response(docs: List[dict], model, response: Optional[Response] = None) -> ORJSONResponse:
+    if VALIDATE_LIST_RESPONSES:
+        content = [model(**doc).model_dump() for doc in docs]
+    else:
+        # Documents written before an optional field existed still get its default
+        defaults = dict(model_defaults(model))
+        content = [{**defaults, **doc} for doc in docs]
+    # Headers set on the injected Response (e.g. X-Next-Cursor) are not applied to a returned response
+    headers = {k: v for k, v in response.headers.items() if k != "content-length"} if response else None
+    return ORJSONResponse(content, headers=headers)
+
+# ==================== RATE LIMITING ====================
+
+# Admission control for endpoints that fan out to expensive work. Each Limiter checks, in
+# order: a per-key token bucket, a global token bucket, a sliding-window count kept in
+# RATE_LIMIT_STORE (shared across workers when it is "mongo") and a cap on requests in
+# flight. Rate rejections are 429 and a full limiter is 503; both carry Retry-After.
+RATE_LIMIT_STORE = os.environ.get('RATE_LIMIT_STORE', 'memory')
+RATE_LIMIT_MAX_KEYS = int(os.environ.get('RATE_LIMIT_MAX_KEYS', 100000))
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Take one token; returns 0 on success, otherwise seconds until one is available."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+class MemoryWindowStore:
+    """Per-process fixed-window counters; sliding estimates are computed by the Limiter."""
+    def __init__(self):
+        self._counts = TTLCache(maxsize=RATE_LIMIT_MAX_KEYS, ttl=24 * 3600)
+
+    async def increment(self, key: str, window_start: int, ttl: float) -> int:
+        count = self._counts.get((key, window_start), 0) + 1
+        self._counts[(key, window_start)] = count
+        return count
+
+    async def count(self, key: str, window_start: int) -> int:
+        return self._counts.get((key, window_start), 0)
+
+class MongoWindowStore:
+    """Window counters in db.rate_limits so every worker sees the same totals."""
+    async def increment(self, key: str, window_start: int, ttl: float) -> int:
+        expire_at = datetime.now(timezone.utc) + timedelta(seconds=ttl)
+        for _ in range(2):
+            try:
+                doc = await db.rate_limits.find_one_and_update(
+                    {"_id": f"{key}:{window_start}"},
+                    {"$inc": {"count": 1}, "$setOnInsert": {"expire_at": expire_at}},
+                    upsert=True,
+                    return_document=ReturnDocument.AFTER
+                )
+                return doc["count"]
+            except DuplicateKeyError:
+                # Two workers raced to create the window document; the retry updates it
+                continue
+        raise HTTPException(status_code=503, detail="Rate limiter unavailable", headers={"Retry-After": "1"})
+
+    async def count(self, key: str, window_start: int) -> int:
+        doc = await db.rate_limits.find_one({"_id": f"{key}:{window_start}"}, {"count": 1})
+        return doc["count"] if doc else 0
+
+WINDOW_STORES = {"memory": MemoryWindowStore, "mongo": MongoWindowStore}
+window_store = WINDOW_STORES[RATE_LIMIT_STORE]()
+
+def _retry_after(seconds: float) -> dict:
+    return {"Retry-After": str(max(math.ceil(seconds), 1))}
+
+class Limiter:
+    def __init__(
+        self,
+        name: str,
+        rate: float,
+        burst: int,
+        global_rate: float,
+        global_burst: int,
+        max_concurrent: int,
+        window_limit: int = 0,
+        window_seconds: int = 60
+    ):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrent = max_concurrent
+        self.window_limit = window_limit
+        self.window_seconds = window_seconds
+        # An idle bucket refills completely after burst / rate seconds, so it can be dropped then
+        self.buckets = TTLCache(maxsize=RATE_LIMIT_MAX_KEYS, ttl=max(burst / rate, 1.0))
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.in_flight = 0
+        self.stats = {"allowed": 0, "limited_key": 0, "limited_global": 0, "limited_window": 0, "busy": 0}
+
+    def _reject(self, reason: str, status_code: int, detail: str, wait: float):
+        self.stats[reason] += 1
+        raise HTTPException(status_code=status_code, detail=detail, headers=_retry_after(wait))
+
+    async def _window_wait(self, key: str) -> float:
+        # Sliding-window estimate from the current and previous fixed windows
+        now = time.time()
+        current = int(now // self.window_seconds) * self.window_seconds
+        previous = await window_store.count(f"{self.name}:{key}", current - self.window_seconds)
+        count = await window_store.increment(f"{self.name}:{key}", current, 2 * self.window_seconds)
+        weight = 1 - (now - current) / self.window_seconds
+        if previous * weight + count <= self.window_limit:
+            return 0.0
+        return current + self.window_seconds - now
+
+    async def admit(self, key: str):
+        """Admit one request for key or raise; returns an idempotent release callable."""
+        bucket = self.buckets.get(key) or TokenBucket(self.rate, self.burst)
+        wait = bucket.take()
+        # Re-inserting refreshes the entry's TTL while the key stays active
+        self.buckets[key] = bucket
+        if wait:
+            self._reject("limited_key", 429, "Too many requests", wait)
+        wait = self.global_bucket.take()
+        if wait:
+            self._reject("limited_global", 429, "Service is busy, try again", wait)
+        if self.window_limit:
+            wait = await self._window_wait(key)
+            if wait:
+                self._reject("limited_window", 429, "Too many requests", wait)
+        if self.in_flight >= self.max_concurrent:
+            self._reject("busy", 503, "Service is busy, try again", 1)
+        
+        self.in_flight += 1
+        self.stats["allowed"] += 1
+        released = False
+        
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                self.in_flight -= 1
+        return release
+
+    @asynccontextmanager
+    async def limit(self, key: str):
+        release = await self.admit(key)
+        try:
+            yield
+        finally:
+            release()
+
+    def snapshot(self) -> dict:
+        return {
+            **self.stats,
+            "in_flight": self.in_flight,
+            "max_concurrent": self.max_concurrent,
+            "rate": self.rate,
+            "burst": self.burst,
+            "window_limit": self.window_limit,
+            "window_seconds": self.window_seconds,
+            "tracked_keys": len(self.buckets)
+        }
+
+def limiter_from_env(name: str, **defaults) -> Limiter:
+    # RATE_LIMIT_<NAME>_<FIELD> overrides any default, e.g. RATE_LIMIT_CHAT_AI_BURST=10
+    prefix = f"RATE_LIMIT_{name.upper()}_"
+    return Limiter(name, **{
+        field: type(value)(os.environ.get(prefix + field.upper(), value))
+        for field, value in defaults.items()
+    })
+
+chat_ai_limiter = limiter_from_env(
+    "chat_ai", rate=0.2, burst=5, global_rate=5.0, global_burst=20, max_concurrent=20,
+    window_limit=60, window_seconds=600
+)
+site_check_limiter = limiter_from_env(
+    "site_check", rate=1.0, burst=10, global_rate=20.0, global_burst=50, max_concurrent=20,
+    window_limit=300, window_seconds=600
+)
+login_limiter = limiter_from_env(
+    "login", rate=0.2, burst=5, global_rate=50.0, global_burst=100, max_concurrent=50,
+    window_limit=30, window_seconds=600
+)
+# Keyed on the account alone, so rotating (or forging) the client address cannot reset it;
+# looser than login_limiter because every address trying that account shares it
+login_account_limiter = limiter_from_env(
+    "login_account", rate=0.05, burst=10, global_rate=50.0, global_burst=100, max_concurrent=50,
+    window_limit=50, window_seconds=3600
+)
+LIMITERS = [chat_ai_limiter, site_check_limiter, login_limiter, login_account_limiter]
+
+# Proxies in front of the app that append the caller's address to X-Forwarded-For (1 behind
+# Koyeb's edge, 0 when clients connect directly). Only the entries those proxies appended are
+# trusted: everything to their left was sent by the client and can say anything.
+TRUSTED_PROXY_HOPS = int(os.environ.get('TRUSTED_PROXY_HOPS', 0))
+
+def client_ip(request: Request) -> str:
+    if TRUSTED_PROXY_HOPS > 0:
+        forwarded = ",".join(request.headers.getlist("x-forwarded-for"))
+        hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+        if len(hops) >= TRUSTED_PROXY_HOPS:
+            return hops[-TRUSTED_PROXY_HOPS]
+    return request.client.host if request.client else "unknown"
+
+def login_account_key(email: str) -> str:
+    return email.strip().casefold()
+
+def login_limit_key(email: str, request: Request) -> str:
+    # Keyed per account and address, so one shared egress IP does not throttle everyone
+    return f"{login_account_key(email)}|{client_ip(request)}"
+
 # ==================== AUTH HELPERS ====================
 
+# bcrypt runs in a dedicated thread pool (it releases the GIL) so logins never block the event loop
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', 12))
+BCRYPT_POOL_SIZE = int(os.environ.get('BCRYPT_POOL_SIZE', min(4, os.cpu_count() or 1)))
+BCRYPT_MAX_QUEUE = int(os.environ.get('BCRYPT_MAX_QUEUE', 100))
+
+bcrypt_executor = ThreadPoolExecutor(max_workers=BCRYPT_POOL_SIZE, thread_name_prefix="bcrypt")
+bcrypt_stats = {"pending": 0, "peak_pending": 0, "completed": 0, "rejected": 0}
+
 def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode()
 
 def verify_password(password: str, hashed: str) -> bool:
     return bcrypt.checkpw(password.encode(), hashed.encode())
 
+async def run_bcrypt(func, *args):
+    if bcrypt_stats["pending"] >= BCRYPT_MAX_QUEUE:
+        bcrypt_stats["rejected"] += 1
+        raise HTTPException(
+            status_code=503,
+            detail="Authentication service busy, try again",
+            headers={"Retry-After": "1"}
+        )
+    
+    bcrypt_stats["pending"] += 1
+    bcrypt_stats["peak_pending"] = max(bcrypt_stats["peak_pending"], bcrypt_stats["pending"])
+    try:
+        return await asyncio.get_running_loop().run_in_executor(bcrypt_executor, func, *args)
+    finally:
+        bcrypt_stats["pending"] -= 1
+        bcrypt_stats["completed"] += 1
+
 def create_token(user_id: str, role: str) -> str:
     payload = {
         "user_id": user_id,
@@ -202,13 +708,49 @@ def create_token(user_id: str, role: str) -> str:
     }
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
+def create_stream_ticket(user_id: str) -> str:
+    # Browsers cannot set headers on WebSocket/EventSource, so these connections put a
+    # credential in the URL; a ticket limits what leaks into logs to a minute of stream access
+    payload = {
+        "user_id": user_id,
+        "purpose": "stream",
+        "exp": datetime.now(timezone.utc) + timedelta(seconds=STREAM_TICKET_TTL)
+    }
+    return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
+
+# Authenticated user documents (without password) keyed by user id. Every write to a user
+# in this process invalidates its entry; other workers see changes after USER_CACHE_TTL.
+USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 10000))
+USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', 30))
+
+user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+user_cache_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+def invalidate_user_cache(*user_ids: str):
+    for user_id in user_ids:
+        if user_cache.pop(user_id, None) is not None:
+            user_cache_stats["invalidations"] += 1
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    return await authenticate_token(credentials.credentials)
+
+async def authenticate_token(token: str, purpose: Optional[str] = None) -> dict:
     try:
-        payload = jwt.decode(credentials.credentials, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        user = await db.users.find_one({"id": payload["user_id"]}, {"_id": 0})
+        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        # Session tokens carry no purpose; stream tickets are not accepted as session tokens and vice versa
+        if payload.get("purpose") != purpose:
+            raise HTTPException(status_code=401, detail="Invalid token")
+        user = user_cache.get(payload["user_id"])
+        if user is not None:
+            user_cache_stats["hits"] += 1
+            return dict(user)
+        
+        user_cache_stats["misses"] += 1
+        user = await db.users.find_one({"id": payload["user_id"]}, {"_id": 0, "password": 0})
         if not user:
             raise HTTPException(status_code=401, detail="User not found")
-        return user
+        user_cache[payload["user_id"]] = user
+        return dict(user)
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
     except jwt.InvalidTokenError:
@@ -227,6 +769,10 @@ def require_roles(allowed_roles: List[str]):
 
 # ==================== AUTH ROUTES ====================
 
+@api_router.post("/auth/stream-ticket")
+async def issue_stream_ticket(user: dict = Depends(get_current_user)):
+    return {"ticket": create_stream_ticket(user["id"]), "expires_in": STREAM_TICKET_TTL}
+
 @api_router.post("/auth/register", response_model=dict)
 async def register(user_data: UserCreate):
     existing = await db.users.find_one({"email": user_data.email})
@@ -242,7 +788,7 @@ async def register(user_data: UserCreate):
         "id": user_id,
         "email": user_data.email,
         "username": user_data.username,
-        "password": hash_password(user_data.password),
+        "password": await run_bcrypt(hash_password, user_data.password),
         "role": user_data.role,
         "missions_completed": 0,
         "reports_submitted": 0,
@@ -250,7 +796,16 @@ async def register(user_data: UserCreate):
         "created_at": datetime.now(timezone.utc).isoformat()
     }
     
-    await db.users.insert_one(user_doc)
+    try:
+        await db.users.insert_one(user_doc)
+    except DuplicateKeyError:
+        # A concurrent registration passed the checks above first; the unique indexes decide
+        if await db.users.find_one({"email": user_data.email}, {"_id": 1}):
+            raise HTTPException(status_code=400, detail="Email already registered")
+        raise HTTPException(status_code=400, detail="Username already taken")
+    await increment_counters(counter_delta("users", after=user_doc))
+    if is_ranked(user_doc):
+        leaderboard.set(user_id, 0)
     token = create_token(user_id, user_data.role)
     
     return {
@@ -268,10 +823,12 @@ async def register(user_data: UserCreate):
     }
 
 @api_router.post("/auth/login", response_model=dict)
-async def login(credentials: UserLogin):
-    user = await db.users.find_one({"email": credentials.email}, {"_id": 0})
-    if not user or not verify_password(credentials.password, user["password"]):
-        raise HTTPException(status_code=401, detail="Invalid credentials")
+async def login(credentials: UserLogin, request: Request):
+    async with login_account_limiter.limit(login_account_key(credentials.email)), \
+            login_limiter.limit(login_limit_key(credentials.email, request)):
+        user = await db.users.find_one({"email": credentials.email}, {"_id": 0})
+        if not user or not await run_bcrypt(verify_password, credentials.password, user["password"]):
+            raise HTTPException(status_code=401, detail="Invalid credentials")
     
     token = create_token(user["id"], user["role"])
     
@@ -293,20 +850,150 @@ async def login(credentials: UserLogin):
 async def get_me(user: dict = Depends(get_current_user)):
     return UserResponse(**user)
 
+# ==================== LEADERBOARD ====================
+
+# Order-statistic index of non-external users by (rank_points desc, user id), so rank
+# lookups and windows are O(log n) instead of sorting db.users on every read. Writers
+# apply their rank_points delta once the database update has succeeded; deltas commute,
+# so concurrent increments end in the same state whatever order they land in. Increments
+# made by other processes are picked up by the periodic resync from db.users.
+LEADERBOARD_RESYNC_INTERVAL = float(os.environ.get('LEADERBOARD_RESYNC_INTERVAL', 60))
+RANKING_PAGE_MAX = 100
+
+class Leaderboard:
+    def __init__(self):
+        self._points = {}
+        self._order = SortedList()
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def load(self, points_by_user: dict) -> int:
+        """Replace the contents; returns how many users were missing, extra or off."""
+        drift = sum(1 for user_id in points_by_user.keys() | self._points.keys()
+                    if points_by_user.get(user_id) != self._points.get(user_id))
+        self._points = dict(points_by_user)
+        self._order = SortedList((-points, user_id) for user_id, points in self._points.items())
+        return drift
+
+    def set(self, user_id: str, points: int):
+        self.remove(user_id)
+        self._points[user_id] = points
+        self._order.add((-points, user_id))
+
+    def add(self, user_id: str, delta: int):
+        # Users that are not ranked (external, or not loaded yet) are left to the resync
+        if delta and user_id in self._points:
+            self.set(user_id, self._points[user_id] + delta)
+
+    def remove(self, user_id: str):
+        points = self._points.pop(user_id, None)
+        if points is not None:
+            self._order.remove((-points, user_id))
+
+    def points(self, user_id: str) -> Optional[int]:
+        return self._points.get(user_id)
+
+    def position(self, user_id: str) -> Optional[int]:
+        """0-based position in leaderboard order, or None when the user is not ranked."""
+        points = self._points.get(user_id)
+        if points is None:
+            return None
+        return self._order.index((-points, user_id))
+
+    def rank(self, points: int) -> int:
+        """Competition rank of a score: users tied on points share the same rank."""
+        return self._order.bisect_left((-points,)) + 1
+
+    def window(self, start: int, count: int) -> List[tuple]:
+        return [(user_id, -points) for points, user_id in self._order.islice(start, start + count)]
+
+leaderboard = Leaderboard()
+leaderboard_stats = {"last_resync_at": None, "last_drift": 0}
+
+def is_ranked(user: dict) -> bool:
+    return user.get("role") != UserRole.EXTERNO
+
+async def resync_leaderboard() -> int:
+    # Increments racing with the scan can be lost or counted twice; the next resync corrects it
+    users = await db.users.find(
+        {"role": {"$ne": UserRole.EXTERNO}},
+        {"_id": 0, "id": 1, "rank_points": 1}
+    ).to_list(None)
+    drift = leaderboard.load({u["id"]: u.get("rank_points", 0) for u in users})
+    leaderboard_stats.update({"last_resync_at": datetime.now(timezone.utc).isoformat(), "last_drift": drift})
+    return drift
+
+async def background_leaderboard_resync():
+    while True:
+        await asyncio.sleep(LEADERBOARD_RESYNC_INTERVAL)
+        try:
+            await resync_leaderboard()
+        except Exception as e:
+            logger.error(f"Leaderboard resync error: {str(e)}")
+
+async def ranking_entries(start: int, count: int) -> List[RankingEntry]:
+    window = leaderboard.window(start, count)
+    users = await db.users.find(
+        {"id": {"$in": [user_id for user_id, _ in window]}},
+        {"_id": 0, "password": 0}
+    ).to_list(None)
+    users_by_id = {u["id"]: u for u in users}
+    return [
+        RankingEntry(position=start + i + 1, rank=leaderboard.rank(points), user=UserResponse(**users_by_id[user_id]))
+        for i, (user_id, points) in enumerate(window)
+        if user_id in users_by_id
+    ]
+
 # ==================== USER ROUTES ====================
 
 @api_router.get("/users", response_model=List[UserResponse])
-async def get_users(user: dict = Depends(require_roles([UserRole.ADMIN, UserRole.TENENTE]))):
-    users = await db.users.find({}, {"_id": 0, "password": 0}).to_list(1000)
-    return [UserResponse(**u) for u in users]
+async def get_users(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+    user: dict = Depends(require_roles([UserRole.ADMIN, UserRole.TENENTE]))
+):
+    users = await fetch_page(db.users, {}, model_projection(UserResponse), cursor, limit, response)
+    return list_response(users, UserResponse, response)
 
 @api_router.get("/users/ranking", response_model=List[UserResponse])
-async def get_ranking(user: dict = Depends(get_current_user)):
-    users = await db.users.find(
-        {"role": {"$ne": UserRole.EXTERNO}},
-        {"_id": 0, "password": 0}
-    ).sort("rank_points", -1).to_list(50)
-    return [UserResponse(**u) for u in users]
+async def get_ranking(
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=RANKING_PAGE_MAX),
+    user: dict = Depends(get_current_user)
+):
+    return [entry.user for entry in await ranking_entries(offset, limit)]
+
+@api_router.get("/users/ranking/me", response_model=RankingPosition)
+async def get_my_ranking(user: dict = Depends(get_current_user)):
+    position = leaderboard.position(user["id"])
+    if position is None:
+        return RankingPosition(user_id=user["id"], rank_points=user.get("rank_points", 0), total=len(leaderboard))
+    points = leaderboard.points(user["id"])
+    return RankingPosition(
+        user_id=user["id"],
+        position=position + 1,
+        rank=leaderboard.rank(points),
+        rank_points=points,
+        total=len(leaderboard)
+    )
+
+@api_router.get("/users/ranking/around/{user_id}", response_model=RankingWindow)
+async def get_ranking_around(
+    user_id: str,
+    before: int = Query(5, ge=0, le=RANKING_PAGE_MAX),
+    after: int = Query(5, ge=0, le=RANKING_PAGE_MAX),
+    user: dict = Depends(get_current_user)
+):
+    position = leaderboard.position(user_id)
+    if position is None:
+        raise HTTPException(status_code=404, detail="User not ranked")
+    start = max(position - before, 0)
+    return RankingWindow(
+        total=len(leaderboard),
+        entries=await ranking_entries(start, position - start + after + 1)
+    )
 
 @api_router.put("/users/{user_id}", response_model=UserResponse)
 async def update_user(user_id: str, update_data: UserUpdate, user: dict = Depends(require_roles([UserRole.ADMIN]))):
@@ -314,60 +1001,297 @@ async def update_user(user_id: str, update_data: UserUpdate, user: dict = Depend
     if not update_dict:
         raise HTTPException(status_code=400, detail="No fields to update")
     
-    result = await db.users.update_one({"id": user_id}, {"$set": update_dict})
-    if result.modified_count == 0:
+    try:
+        previous_user = await db.users.find_one_and_update(
+            {"id": user_id},
+            {"$set": update_dict},
+            projection={"_id": 0, "password": 0}
+        )
+    except DuplicateKeyError:
+        # Renamed to a username the unique index already holds
+        raise HTTPException(status_code=400, detail="Username already taken")
+    if not previous_user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    updated_user = await db.users.find_one({"id": user_id}, {"_id": 0, "password": 0})
+    invalidate_user_cache(user_id)
+    updated_user = {**previous_user, **update_dict}
+    await increment_counters(counter_delta("users", previous_user, updated_user))
+    if is_ranked(updated_user):
+        if not is_ranked(previous_user):
+            leaderboard.set(user_id, updated_user.get("rank_points", 0))
+    else:
+        leaderboard.remove(user_id)
     return UserResponse(**updated_user)
 
 @api_router.delete("/users/{user_id}")
 async def delete_user(user_id: str, user: dict = Depends(require_roles([UserRole.ADMIN]))):
-    result = await db.users.delete_one({"id": user_id})
-    if result.deleted_count == 0:
+    deleted_user = await db.users.find_one_and_delete({"id": user_id}, projection={"_id": 0, "role": 1})
+    invalidate_user_cache(user_id)
+    if not deleted_user:
         raise HTTPException(status_code=404, detail="User not found")
+    leaderboard.remove(user_id)
+    await increment_counters(counter_delta("users", before=deleted_user))
     return {"message": "User deleted"}
 
 # ==================== SITE CHECK ====================
 
+# Background sweep tuning
+SITE_CHECK_INTERVAL = float(os.environ.get('SITE_CHECK_INTERVAL', 60))
+SITE_CHECK_CONCURRENCY = int(os.environ.get('SITE_CHECK_CONCURRENCY', 50))
+SITE_CHECK_PER_HOST = int(os.environ.get('SITE_CHECK_PER_HOST', 4))
+SITE_CHECK_SWEEP_DEADLINE = float(os.environ.get('SITE_CHECK_SWEEP_DEADLINE', 50))
+SITE_CHECK_WRITE_BATCH_SIZE = int(os.environ.get('SITE_CHECK_WRITE_BATCH_SIZE', 500))
+
+# Per-mission re-check scheduling: stable sites back off exponentially up to the max interval,
+# a status change resets to the min interval and high priority missions are capped lower
+SITE_CHECK_MIN_INTERVAL = int(os.environ.get('SITE_CHECK_MIN_INTERVAL', 60))
+SITE_CHECK_MAX_INTERVAL = int(os.environ.get('SITE_CHECK_MAX_INTERVAL', 6 * 3600))
+SITE_CHECK_BACKOFF_FACTOR = float(os.environ.get('SITE_CHECK_BACKOFF_FACTOR', 2))
+SITE_CHECK_PRIORITY_MAX_INTERVAL = {
+    "high": int(os.environ.get('SITE_CHECK_HIGH_PRIORITY_MAX_INTERVAL', 300))
+}
+
+# Shared HTTP client tuning
+SITE_CHECK_TIMEOUT = float(os.environ.get('SITE_CHECK_TIMEOUT', 10))
+SITE_CHECK_MAX_CONNECTIONS = int(os.environ.get('SITE_CHECK_MAX_CONNECTIONS', SITE_CHECK_CONCURRENCY + 20))
+SITE_CHECK_MAX_KEEPALIVE = int(os.environ.get('SITE_CHECK_MAX_KEEPALIVE', 20))
+SITE_CHECK_KEEPALIVE_EXPIRY = float(os.environ.get('SITE_CHECK_KEEPALIVE_EXPIRY', 30))
+SITE_CHECK_HTTP2 = os.environ.get('SITE_CHECK_HTTP2', 'false').lower() == 'true'
+SITE_CHECK_MAX_BODY_BYTES = int(os.environ.get('SITE_CHECK_MAX_BODY_BYTES', 64 * 1024))
+
+site_check_stats = {
+    "last_sweep_at": None,
+    "duration_seconds": 0.0,
+    "missions": 0,
+    "checks": 0,
+    "skipped": 0,
+    "checks_per_second": 0.0,
+    "writes": 0,
+    "write_round_trips": 0,
+    "write_seconds": 0.0
+}
+
+site_check_client: Optional[httpx.AsyncClient] = None
+
+def create_site_check_client() -> httpx.AsyncClient:
+    http2 = SITE_CHECK_HTTP2
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("SITE_CHECK_HTTP2 is set but the 'h2' package is not installed; using HTTP/1.1")
+            http2 = False
+    return httpx.AsyncClient(
+        timeout=SITE_CHECK_TIMEOUT,
+        follow_redirects=True,
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=SITE_CHECK_MAX_CONNECTIONS,
+            max_keepalive_connections=SITE_CHECK_MAX_KEEPALIVE,
+            keepalive_expiry=SITE_CHECK_KEEPALIVE_EXPIRY
+        )
+    )
+
+def get_site_check_client() -> httpx.AsyncClient:
+    global site_check_client
+    if site_check_client is None or site_check_client.is_closed:
+        site_check_client = create_site_check_client()
+    return site_check_client
+
+async def close_site_check_client():
+    global site_check_client
+    if site_check_client is not None:
+        await site_check_client.aclose()
+        site_check_client = None
+
 async def check_site_status(url: str) -> int:
+    http_client = get_site_check_client()
+    
+    # HEAD first: an online site answers without sending a body
+    try:
+        response = await http_client.head(url)
+        if response.status_code < 400:
+            return response.status_code
+    except (httpx.ConnectError, httpx.TimeoutException):
+        return 0
+    except Exception:
+        pass
+    
+    # Confirm errors (and servers that reject HEAD) with a GET, reading at most a capped prefix of the body
     try:
-        async with httpx.AsyncClient(timeout=10.0, follow_redirects=True) as client:
-            response = await client.get(url)
+        async with http_client.stream("GET", url) as response:
+            received = 0
+            async for chunk in response.aiter_raw():
+                received += len(chunk)
+                if received >= SITE_CHECK_MAX_BODY_BYTES:
+                    break
             return response.status_code
     except Exception:
         return 0
 
+def schedule_next_check(mission: dict, status_code: int) -> dict:
+    previous_interval = mission.get("check_interval") or SITE_CHECK_MIN_INTERVAL
+    if mission.get("site_status") != status_code:
+        interval = SITE_CHECK_MIN_INTERVAL
+    else:
+        interval = min(int(previous_interval * SITE_CHECK_BACKOFF_FACTOR), SITE_CHECK_MAX_INTERVAL)
+    interval = min(interval, SITE_CHECK_PRIORITY_MAX_INTERVAL.get(mission.get("priority"), SITE_CHECK_MAX_INTERVAL))
+    return {
+        "check_interval": interval,
+        "next_check_at": (datetime.now(timezone.utc) + timedelta(seconds=interval)).isoformat()
+    }
+
+async def probe_sites(urls: List[str]) -> dict:
+    # Probes each distinct URL concurrently, bounded globally and per host.
+    # URLs still running when the sweep deadline hits are left out of the result.
+    global_limit = asyncio.Semaphore(SITE_CHECK_CONCURRENCY)
+    host_limits = {}
+    results = {}
+    
+    async def probe(url: str):
+        host = urlsplit(url).hostname or url
+        host_limit = host_limits.setdefault(host, asyncio.Semaphore(SITE_CHECK_PER_HOST))
+        async with host_limit:
+            async with global_limit:
+                results[url] = await check_site_status(url)
+    
+    tasks = [asyncio.create_task(probe(url)) for url in set(urls)]
+    if tasks:
+        _, pending = await asyncio.wait(tasks, timeout=SITE_CHECK_SWEEP_DEADLINE)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+    return results
+
+async def flush_bulk_writes(collection, operations: list) -> int:
+    # Unordered bulk writes in SITE_CHECK_WRITE_BATCH_SIZE chunks; returns the number of round-trips
+    round_trips = 0
+    for start in range(0, len(operations), SITE_CHECK_WRITE_BATCH_SIZE):
+        await collection.bulk_write(operations[start:start + SITE_CHECK_WRITE_BATCH_SIZE], ordered=False)
+        round_trips += 1
+    return round_trips
+
+async def run_site_check_sweep():
+    started = time.monotonic()
+    now = datetime.now(timezone.utc).isoformat()
+    # Only missions that are due; documents created before scheduling existed have no next_check_at
+    missions = await db.missions.find(
+        {
+            "status": {"$in": [MissionStatus.PENDING, MissionStatus.IN_PROGRESS]},
+            "$or": [{"next_check_at": {"$lte": now}}, {"next_check_at": None}]
+        },
+        {
+            "_id": 0, "id": 1, "title": 1, "target_url": 1, "status": 1, "assigned_to": 1,
+            "priority": 1, "category": 1, "site_status": 1, "check_interval": 1
+        }
+    ).sort("next_check_at", 1).to_list(1000)
+    
+    results = await probe_sites([mission["target_url"] for mission in missions])
+    
+    # Every write is conditional on the status read above, so a mission completed, edited or
+    # deleted while the probes ran is left alone. Plain rescheduling goes out in bulk; the rare
+    # writes that move a counter are sent one by one so their deltas come from the real pre-image.
+    mission_updates = []
+    transitions = []
+    for mission in missions:
+        status_code = results.get(mission["target_url"])
+        if status_code is None:
+            # Deadline reached before this site answered; retry on the next sweep
+            continue
+        update_data = {"site_status": status_code, **schedule_next_check(mission, status_code)}
+        job = None
+        
+        if status_code == 404 or status_code == 0:
+            if mission["status"] == MissionStatus.IN_PROGRESS:
+                update_data["status"] = MissionStatus.COMPLETED
+                update_data["completed_at"] = datetime.now(timezone.utc).isoformat()
+                # Rewarded through the same outbox job as complete_mission
+                if mission.get("assigned_to"):
+                    job = outbox_entry("mission_completed", {
+                        "user_id": mission["assigned_to"],
+                        "mission_id": mission["id"],
+                        "mission_title": mission.get("title", "")
+                    })
+        
+        if counter_delta("missions", mission, {**mission, **update_data}):
+            transitions.append((mission, update_data, job))
+        else:
+            mission_updates.append(UpdateOne(
+                {"id": mission["id"], "status": mission["status"], "site_status": mission.get("site_status")},
+                {"$set": update_data}
+            ))
+    
+    async def apply_transition(mission: dict, update_data: dict, job: Optional[dict]) -> dict:
+        update = {"$set": update_data}
+        if job:
+            update["$push"] = {"outbox": job}
+        before = await db.missions.find_one_and_update(
+            {"id": mission["id"], "status": mission["status"]},
+            update,
+            projection={"_id": 0, "status": 1, "category": 1, "site_status": 1}
+        )
+        if before is None:
+            return {}
+        if job:
+            await relay_outbox("missions", mission["id"], [job])
+        return counter_delta("missions", before, {**before, **update_data})
+    
+    write_started = time.monotonic()
+    round_trips = await flush_bulk_writes(db.missions, mission_updates)
+    counter_deltas = await asyncio.gather(*(apply_transition(*transition) for transition in transitions))
+    round_trips += len(transitions)
+    await increment_counters(*counter_deltas)
+    write_seconds = time.monotonic() - write_started
+    
+    duration = time.monotonic() - started
+    site_check_stats.update({
+        "last_sweep_at": datetime.now(timezone.utc).isoformat(),
+        "duration_seconds": round(duration, 3),
+        "missions": len(missions),
+        "checks": len(results),
+        "skipped": len({mission["target_url"] for mission in missions}) - len(results),
+        "checks_per_second": round(len(results) / duration, 2) if duration > 0 else 0.0,
+        "writes": len(mission_updates) + len(transitions),
+        "write_round_trips": round_trips,
+        "write_seconds": round(write_seconds, 3)
+    })
+    # The per-document path cost one round-trip per mission
+    per_document_writes = len(mission_updates) + len(transitions)
+    logger.info(
+        f"Site check sweep: {len(missions)} due missions, {len(results)} checks in "
+        f"{duration:.2f}s ({site_check_stats['checks_per_second']} checks/s, "
+        f"{site_check_stats['skipped']} skipped); {round_trips} write round-trips in "
+        f"{write_seconds:.3f}s vs {per_document_writes} per-document writes"
+    )
+    return duration
+
 async def background_site_check():
     while True:
-        missions = await db.missions.find(
-            {"status": {"$in": [MissionStatus.PENDING, MissionStatus.IN_PROGRESS]}}
-        ).to_list(1000)
-        
-        for mission in missions:
-            status_code = await check_site_status(mission["target_url"])
-            update_data = {"site_status": status_code}
-            
-            if status_code == 404 or status_code == 0:
-                if mission["status"] == MissionStatus.IN_PROGRESS:
-                    update_data["status"] = MissionStatus.COMPLETED
-                    update_data["completed_at"] = datetime.now(timezone.utc).isoformat()
-                    
-                    if mission.get("assigned_to"):
-                        await db.users.update_one(
-                            {"id": mission["assigned_to"]},
-                            {"$inc": {"missions_completed": 1, "rank_points": 100}}
-                        )
-            
-            await db.missions.update_one({"id": mission["id"]}, {"$set": update_data})
+        duration = 0.0
+        try:
+            duration = await run_site_check_sweep()
+        except Exception as e:
+            logger.error(f"Site check sweep error: {str(e)}")
         
-        await asyncio.sleep(60)
+        await asyncio.sleep(max(SITE_CHECK_INTERVAL - duration, 0))
 
 @api_router.post("/site-check")
 async def manual_site_check(url: str, user: dict = Depends(get_current_user)):
-    status_code = await check_site_status(url)
+    async with site_check_limiter.limit(user["id"]):
+        status_code = await check_site_status(url)
     return {"url": url, "status_code": status_code, "is_online": status_code == 200}
 
+@api_router.get("/site-check/stats")
+async def get_site_check_stats(user: dict = Depends(require_roles([UserRole.ADMIN]))):
+    return {
+        **site_check_stats,
+        "concurrency": SITE_CHECK_CONCURRENCY,
+        "per_host": SITE_CHECK_PER_HOST,
+        "sweep_deadline_seconds": SITE_CHECK_SWEEP_DEADLINE,
+        "write_batch_size": SITE_CHECK_WRITE_BATCH_SIZE,
+        "interval_seconds": SITE_CHECK_INTERVAL
+    }
+
 # ==================== MISSION ROUTES ====================
 
 @api_router.post("/missions", response_model=MissionResponse)
@@ -387,6 +1311,7 @@ async def create_mission(
         "priority": mission_data.priority,
         "status": MissionStatus.PENDING,
         "site_status": site_status,
+        **schedule_next_check({"priority": mission_data.priority}, site_status),
         "assigned_to": None,
         "assigned_username": None,
         "created_by": user["id"],
@@ -396,12 +1321,17 @@ async def create_mission(
     }
     
     await db.missions.insert_one(mission_doc)
+    await increment_counters(counter_delta("missions", after=mission_doc))
     return MissionResponse(**mission_doc)
 
-@api_router.get("/missions", response_model=List[MissionResponse])
+@api_router.get("/missions", response_model=Union[List[MissionResponse], List[MissionSummary]])
 async def get_missions(
+    response: Response,
     status: Optional[str] = None,
     category: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+    fields: str = Query("full", pattern="^(full|summary)$"),
     user: dict = Depends(get_current_user)
 ):
     if user["role"] == UserRole.EXTERNO:
@@ -413,8 +1343,9 @@ async def get_missions(
     if category:
         query["category"] = category
     
-    missions = await db.missions.find(query, {"_id": 0}).sort("created_at", -1).to_list(1000)
-    return [MissionResponse(**m) for m in missions]
+    model = MissionSummary if fields == "summary" else MissionResponse
+    missions = await fetch_page(db.missions, query, model_projection(model), cursor, limit, response)
+    return list_response(missions, model, response)
 
 @api_router.get("/missions/{mission_id}", response_model=MissionResponse)
 async def get_mission(mission_id: str, user: dict = Depends(get_current_user)):
@@ -431,23 +1362,25 @@ async def accept_mission(mission_id: str, user: dict = Depends(get_current_user)
     if user["role"] == UserRole.EXTERNO:
         raise HTTPException(status_code=403, detail="External users cannot accept missions")
     
-    mission = await db.missions.find_one({"id": mission_id}, {"_id": 0})
-    if not mission:
-        raise HTTPException(status_code=404, detail="Mission not found")
-    
-    if mission["status"] != MissionStatus.PENDING:
-        raise HTTPException(status_code=400, detail="Mission is not available")
-    
-    await db.missions.update_one(
-        {"id": mission_id},
+    # Matching on the pending status means two agents accepting at once cannot both win
+    updated_mission = await db.missions.find_one_and_update(
+        {"id": mission_id, "status": MissionStatus.PENDING},
         {"$set": {
             "status": MissionStatus.IN_PROGRESS,
             "assigned_to": user["id"],
             "assigned_username": user["username"]
-        }}
+        }},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
     )
+    if updated_mission is None:
+        if not await db.missions.find_one({"id": mission_id}, {"_id": 1}):
+            raise HTTPException(status_code=404, detail="Mission not found")
+        raise HTTPException(status_code=400, detail="Mission is not available")
     
-    updated_mission = await db.missions.find_one({"id": mission_id}, {"_id": 0})
+    await increment_counters(counter_delta(
+        "missions", {**updated_mission, "status": MissionStatus.PENDING}, updated_mission
+    ))
     return MissionResponse(**updated_mission)
 
 @api_router.post("/missions/{mission_id}/complete", response_model=MissionResponse)
@@ -464,39 +1397,42 @@ async def complete_mission(mission_id: str, user: dict = Depends(get_current_use
     if site_status == 200:
         raise HTTPException(status_code=400, detail="Site is still online. Mission cannot be completed.")
     
-    await db.missions.update_one(
-        {"id": mission_id},
-        {"$set": {
-            "status": MissionStatus.COMPLETED,
-            "site_status": site_status,
-            "completed_at": datetime.now(timezone.utc).isoformat()
-        }}
-    )
-    
-    await db.users.update_one(
-        {"id": user["id"]},
-        {"$inc": {"missions_completed": 1, "rank_points": 100}}
-    )
-    
-    # Check and award badges
-    await check_and_award_badges(user["id"])
-    
-    # Notify user
-    await create_notification(
-        user["id"],
-        "🎯 Missão Concluída!",
-        f"Parabéns! Você completou a missão '{mission['title']}' e ganhou +100 pontos!",
-        "mission"
+    # Only the request that flips the status records the reward, so a double submit pays once.
+    # The job rides in the same update as the flip; points, badges and the notification are
+    # applied by the job workers once it is relayed from the outbox.
+    job = outbox_entry("mission_completed", {
+        "user_id": user["id"],
+        "mission_id": mission_id,
+        "mission_title": mission["title"]
+    })
+    update_data = {
+        "status": MissionStatus.COMPLETED,
+        "site_status": site_status,
+        "completed_at": datetime.now(timezone.utc).isoformat()
+    }
+    # The probe can take seconds, so the delta comes from the pre-image this update returns
+    before = await db.missions.find_one_and_update(
+        {"id": mission_id, "status": {"$ne": MissionStatus.COMPLETED}},
+        {"$set": update_data, "$push": {"outbox": job}},
+        projection={"_id": 0}
     )
+    if before is None:
+        raise HTTPException(status_code=400, detail="Mission already completed")
+    updated_mission = {**before, **update_data}
+    await increment_counters(counter_delta("missions", before, updated_mission))
+    await relay_outbox("missions", mission_id, [job])
     
-    updated_mission = await db.missions.find_one({"id": mission_id}, {"_id": 0})
     return MissionResponse(**updated_mission)
 
 @api_router.delete("/missions/{mission_id}")
 async def delete_mission(mission_id: str, user: dict = Depends(require_roles([UserRole.ADMIN, UserRole.TENENTE]))):
-    result = await db.missions.delete_one({"id": mission_id})
-    if result.deleted_count == 0:
+    deleted_mission = await db.missions.find_one_and_delete(
+        {"id": mission_id},
+        projection={"_id": 0, "status": 1, "category": 1, "site_status": 1}
+    )
+    if not deleted_mission:
         raise HTTPException(status_code=404, detail="Mission not found")
+    await increment_counters(counter_delta("missions", before=deleted_mission))
     return {"message": "Mission deleted"}
 
 # ==================== REPORT ROUTES ====================
@@ -516,24 +1452,23 @@ async def create_report(report_data: ReportCreate, user: dict = Depends(get_curr
         "reviewed_by": None,
         "created_at": datetime.now(timezone.utc).isoformat(),
         "reviewed_at": None,
-        "evidence": report_data.evidence
+        "evidence": report_data.evidence,
+        "outbox": [outbox_entry("report_submitted", {"user_id": user["id"], "report_id": report_id})]
     }
     
     await db.reports.insert_one(report_doc)
-    
-    await db.users.update_one(
-        {"id": user["id"]},
-        {"$inc": {"reports_submitted": 1, "rank_points": 10}}
-    )
-    
-    # Check and award badges
-    await check_and_award_badges(user["id"])
+    await increment_counters(counter_delta("reports", after=report_doc))
+    await relay_outbox("reports", report_id, report_doc["outbox"])
     
     return ReportResponse(**report_doc)
 
-@api_router.get("/reports", response_model=List[ReportResponse])
+@api_router.get("/reports", response_model=Union[List[ReportResponse], List[ReportSummary]])
 async def get_reports(
+    response: Response,
     status: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+    fields: str = Query("full", pattern="^(full|summary)$"),
     user: dict = Depends(get_current_user)
 ):
     query = {}
@@ -543,26 +1478,40 @@ async def get_reports(
     elif status:
         query["status"] = status
     
-    reports = await db.reports.find(query, {"_id": 0}).sort("created_at", -1).to_list(1000)
-    return [ReportResponse(**r) for r in reports]
+    model = ReportSummary if fields == "summary" else ReportResponse
+    reports = await fetch_page(db.reports, query, model_projection(model), cursor, limit, response)
+    return list_response(reports, model, response)
 
-@api_router.post("/reports/{report_id}/accept", response_model=MissionResponse)
-async def accept_report(report_id: str, user: dict = Depends(require_roles([UserRole.ADMIN, UserRole.TENENTE, UserRole.ELITE]))):
+@api_router.get("/reports/{report_id}", response_model=ReportResponse)
+async def get_report(report_id: str, user: dict = Depends(get_current_user)):
     report = await db.reports.find_one({"id": report_id}, {"_id": 0})
-    if not report:
+    # External users only see their own reports, as in the list
+    if not report or (user["role"] == UserRole.EXTERNO and report["submitted_by"] != user["id"]):
         raise HTTPException(status_code=404, detail="Report not found")
-    
-    if report["status"] != ReportStatus.PENDING:
-        raise HTTPException(status_code=400, detail="Report already reviewed")
-    
-    await db.reports.update_one(
-        {"id": report_id},
+    return ReportResponse(**report)
+
+async def review_report(report_id: str, status: str, user: dict) -> dict:
+    # Conditional on pending, so concurrent reviews settle on one winner; returns the report as it was
+    report = await db.reports.find_one_and_update(
+        {"id": report_id, "status": ReportStatus.PENDING},
         {"$set": {
-            "status": ReportStatus.ACCEPTED,
+            "status": status,
             "reviewed_by": user["id"],
             "reviewed_at": datetime.now(timezone.utc).isoformat()
-        }}
+        }},
+        projection={"_id": 0}
     )
+    if report is None:
+        if not await db.reports.find_one({"id": report_id}, {"_id": 1}):
+            raise HTTPException(status_code=404, detail="Report not found")
+        raise HTTPException(status_code=400, detail="Report already reviewed")
+    await increment_counters(counter_delta("reports", report, {**report, "status": status}))
+    return report
+
+@api_router.post("/reports/{report_id}/accept", response_model=MissionResponse)
+async def accept_report(report_id: str, user: dict = Depends(require_roles([UserRole.ADMIN, UserRole.TENENTE, UserRole.ELITE]))):
+    # Only the review that flips the report out of pending goes on to create the mission
+    report = await review_report(report_id, ReportStatus.ACCEPTED, user)
     
     site_status = await check_site_status(report["target_url"])
     
@@ -576,6 +1525,7 @@ async def accept_report(report_id: str, user: dict = Depends(require_roles([User
         "priority": "medium",
         "status": MissionStatus.PENDING,
         "site_status": site_status,
+        **schedule_next_check({"priority": "medium"}, site_status),
         "assigned_to": None,
         "assigned_username": None,
         "created_by": user["id"],
@@ -585,24 +1535,320 @@ async def accept_report(report_id: str, user: dict = Depends(require_roles([User
     }
     
     await db.missions.insert_one(mission_doc)
+    await increment_counters(counter_delta("missions", after=mission_doc))
     return MissionResponse(**mission_doc)
 
 @api_router.post("/reports/{report_id}/reject")
 async def reject_report(report_id: str, user: dict = Depends(require_roles([UserRole.ADMIN, UserRole.TENENTE, UserRole.ELITE]))):
-    report = await db.reports.find_one({"id": report_id}, {"_id": 0})
-    if not report:
-        raise HTTPException(status_code=404, detail="Report not found")
+    await review_report(report_id, ReportStatus.REJECTED, user)
+    return {"message": "Report rejected"}
+
+# ==================== STREAMING UPLOADS ====================
+
+# Uploads are copied in fixed-size chunks to a temp file next to the destination, hashed in
+# the same pass and renamed into place only once complete
+UPLOAD_CHUNK_SIZE = int(os.environ.get('UPLOAD_CHUNK_SIZE', 1024 * 1024))
+MAX_TOOL_UPLOAD_BYTES = int(os.environ.get('MAX_TOOL_UPLOAD_BYTES', 1024 * 1024 * 1024))
+MAX_CHAT_IMAGE_BYTES = int(os.environ.get('MAX_CHAT_IMAGE_BYTES', 10 * 1024 * 1024))
+MAX_REPORT_UPLOAD_BYTES = int(os.environ.get('MAX_REPORT_UPLOAD_BYTES', 100 * 1024 * 1024))
+# Room for multipart boundaries, part headers and the small form fields next to the file
+UPLOAD_FORM_OVERHEAD = 64 * 1024
+UPLOAD_BODY_LIMITS = {
+    "/api/tools/upload": MAX_TOOL_UPLOAD_BYTES,
+    "/api/chat/upload-image": MAX_CHAT_IMAGE_BYTES,
+    "/api/reports/with-file": MAX_REPORT_UPLOAD_BYTES,
+}
+
+def request_body_limit(path: str) -> Optional[int]:
+    # Only multipart uploads are capped; JSON bodies (e.g. long pasted evidence) are left alone
+    if path in UPLOAD_BODY_LIMITS:
+        return UPLOAD_BODY_LIMITS[path] + UPLOAD_FORM_OVERHEAD
+    return None
+
+class RequestBodyLimitMiddleware:
+    # Starlette spools a multipart body to disk before the endpoint runs, so save_upload's
+    # own check comes too late to protect the disk. A declared Content-Length over the
+    # route's limit is refused before anything is read; a body that streams past it anyway
+    # (chunked, or a wrong header) is cut off by the receive wrapper with the same 413.
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        limit = request_body_limit(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+        declared = dict(scope["headers"]).get(b"content-length", b"")
+        if declared.isdigit() and int(declared) > limit:
+            response = ORJSONResponse({"detail": f"Request body too large (max {limit} bytes)"}, status_code=413)
+            await response(scope, receive, send)
+            return
+        
+        received = 0
+        
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # FastAPI re-raises HTTPExceptions from body parsing, so this surfaces as a 413
+                    raise HTTPException(status_code=413, detail=f"Request body too large (max {limit} bytes)")
+            return message
+        
+        await self.app(scope, limited_receive, send)
+
+def _write_chunk(buffer, digest, chunk: bytes):
+    digest.update(chunk)
+    buffer.write(chunk)
+
+async def save_upload(file: UploadFile, dest_path: Path, max_bytes: int) -> dict:
+    dest_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = dest_path.parent / f".{uuid.uuid4()}.part"
+    digest = hashlib.sha256()
+    size = 0
     
-    await db.reports.update_one(
-        {"id": report_id},
-        {"$set": {
-            "status": ReportStatus.REJECTED,
-            "reviewed_by": user["id"],
-            "reviewed_at": datetime.now(timezone.utc).isoformat()
-        }}
+    buffer = await asyncio.to_thread(open, tmp_path, "wb")
+    try:
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise HTTPException(status_code=413, detail=f"File too large (max {max_bytes} bytes)")
+            await asyncio.to_thread(_write_chunk, buffer, digest, chunk)
+        await asyncio.to_thread(buffer.close)
+        await asyncio.to_thread(os.replace, tmp_path, dest_path)
+    except BaseException:
+        await asyncio.to_thread(buffer.close)
+        await asyncio.to_thread(tmp_path.unlink, True)
+        raise
+    
+    return {"path": dest_path, "size": size, "sha256": digest.hexdigest()}
+
+# ==================== BLOB STORE ====================
+
+# Uploaded files are stored once per content hash under uploads/blobs/<sha[:2]>/<sha>.
+# db.blobs keeps one document per hash with the number of tool, report and chat documents
+# referencing it; unreferenced blobs are removed by gc_blobs() after BLOB_GC_GRACE seconds.
+BLOB_DIR = ROOT_DIR / "uploads" / "blobs"
+BLOB_STAGING_DIR = BLOB_DIR / "staging"
+BLOB_GC_INTERVAL = float(os.environ.get('BLOB_GC_INTERVAL', 3600))
+BLOB_GC_GRACE = float(os.environ.get('BLOB_GC_GRACE', 3600))
+BLOB_ID_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+BLOB_PLACE_RETRY_DELAY = 0.1
+BLOB_PLACE_ATTEMPTS = 50
+
+def blob_path(blob_id: str) -> Path:
+    return BLOB_DIR / blob_id[:2] / blob_id
+
+def blob_url(blob_id: str) -> str:
+    return f"/api/uploads/blobs/{blob_id}"
+
+async def store_blob(file: UploadFile, max_bytes: int, content_type: str) -> dict:
+    staged = await save_upload(file, BLOB_STAGING_DIR / str(uuid.uuid4()), max_bytes)
+    return await _place_blob(staged, content_type)
+
+async def store_blob_bytes(data: bytes, content_type: str) -> dict:
+    staged_path = BLOB_STAGING_DIR / str(uuid.uuid4())
+    staged_path.parent.mkdir(parents=True, exist_ok=True)
+    await asyncio.to_thread(staged_path.write_bytes, data)
+    staged = {"path": staged_path, "size": len(data), "sha256": hashlib.sha256(data).hexdigest()}
+    return await _place_blob(staged, content_type)
+
+async def _place_blob(staged: dict, content_type: str) -> dict:
+    blob_id = staged["sha256"]
+    
+    # Take the reference before the file is placed so a concurrent GC cannot collect it.
+    # A blob GC has claimed (collecting) cannot be revived: the upsert then collides on
+    # _id, and we wait for GC to delete the document and start a fresh one.
+    for _ in range(BLOB_PLACE_ATTEMPTS):
+        try:
+            await db.blobs.update_one(
+                {"_id": blob_id, "collecting": {"$ne": True}},
+                {
+                    "$inc": {"refs": 1},
+                    "$unset": {"released_at": ""},
+                    "$setOnInsert": {
+                        "size": staged["size"],
+                        "content_type": content_type,
+                        "created_at": datetime.now(timezone.utc).isoformat()
+                    }
+                },
+                upsert=True
+            )
+            break
+        except DuplicateKeyError:
+            await asyncio.sleep(BLOB_PLACE_RETRY_DELAY)
+    else:
+        await asyncio.to_thread(staged["path"].unlink, True)
+        raise HTTPException(status_code=503, detail="Storage busy, try again", headers={"Retry-After": "1"})
+    
+    # Always move our copy into place: identical content, and it restores a file that a
+    # collection finished just before our reference was taken
+    path = blob_path(blob_id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    await asyncio.to_thread(os.replace, staged["path"], path)
+    
+    return {"blob_id": blob_id, "path": path, "size": staged["size"], "url": blob_url(blob_id)}
+
+async def release_blob(blob_id: str):
+    await db.blobs.update_one(
+        {"_id": blob_id},
+        {"$inc": {"refs": -1}, "$set": {"released_at": datetime.now(timezone.utc).isoformat()}}
     )
+
+async def insert_blob_owner(collection, doc: dict):
+    # store_blob has already taken a reference for doc; if doc never lands, give it back so
+    # the blob can be collected. An error can also follow a successful insert (lost reply),
+    # so the reference is kept whenever the document turns out to exist.
+    try:
+        await collection.insert_one(doc)
+    except BaseException:
+        if doc.get("blob_id"):
+            try:
+                if not await collection.find_one({"id": doc["id"]}, {"_id": 1}):
+                    await release_blob(doc["blob_id"])
+            except PyMongoError as e:
+                logger.error(f"Could not release blob {doc['blob_id']} after a failed insert: {str(e)}")
+        raise
+
+async def gc_blobs() -> int:
+    cutoff = (datetime.now(timezone.utc) - timedelta(seconds=BLOB_GC_GRACE)).isoformat()
+    collected = 0
+    # Claimed blobs left behind by an interrupted run are finished as well
+    candidates = await db.blobs.find(
+        {"$or": [{"refs": {"$lte": 0}, "released_at": {"$lt": cutoff}}, {"collecting": True}]},
+        {"_id": 1}
+    ).to_list(None)
+    for blob in candidates:
+        # Claim atomically; from here on _place_blob will not reuse this document
+        claimed = await db.blobs.find_one_and_update(
+            {"_id": blob["_id"], "refs": {"$lte": 0}},
+            {"$set": {"collecting": True}},
+            projection={"_id": 1}
+        )
+        if not claimed:
+            continue
+        await asyncio.to_thread(blob_path(blob["_id"]).unlink, True)
+        await db.blobs.delete_one({"_id": blob["_id"], "collecting": True})
+        collected += 1
+    return collected
+
+async def background_blob_gc():
+    while True:
+        await asyncio.sleep(BLOB_GC_INTERVAL)
+        try:
+            collected = await gc_blobs()
+            if collected:
+                logger.info(f"Blob GC removed {collected} unreferenced blobs")
+        except Exception as e:
+            logger.error(f"Blob GC error: {str(e)}")
+
+# ==================== FILE RESPONSES ====================
+
+# Downloads answer conditional requests with 304 and single byte ranges with 206.
+# Content-addressed files get a strong ETag (their hash) and immutable caching;
+# legacy files fall back to a weak mtime/size ETag and revalidation.
+FILE_STREAM_CHUNK_SIZE = 64 * 1024
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    bare = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == bare for tag in header.split(","))
+
+def _parse_range(header: str, size: int) -> Optional[tuple]:
+    # Only a single range is served as 206; anything else gets the full file
+    if not header.startswith("bytes=") or "," in header:
+        return None
+    start_text, _, end_text = header[len("bytes="):].strip().partition("-")
+    try:
+        if start_text == "":
+            # Suffix range: the last N bytes
+            suffix = int(end_text)
+            start, end = (max(size - suffix, 0) if suffix > 0 else size), size - 1
+        else:
+            start = int(start_text)
+            end = int(end_text) if end_text else size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    return start, min(end, size - 1)
+
+async def _iter_file_range(path: Path, start: int, length: int):
+    buffer = await asyncio.to_thread(open, path, "rb")
+    try:
+        await asyncio.to_thread(buffer.seek, start)
+        remaining = length
+        while remaining > 0:
+            chunk = await asyncio.to_thread(buffer.read, min(FILE_STREAM_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        await asyncio.to_thread(buffer.close)
+
+def file_response(
+    request: Request,
+    path: Path,
+    content_hash: Optional[str] = None,
+    media_type: Optional[str] = None,
+    filename: Optional[str] = None,
+    private: bool = False
+) -> Response:
+    stat = path.stat()
+    media_type = media_type or mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+    etag = f'"{content_hash}"' if content_hash else f'W/"{int(stat.st_mtime)}-{stat.st_size}"'
+    last_modified = formatdate(stat.st_mtime, usegmt=True)
+    caching = f"max-age={IMMUTABLE_MAX_AGE}, immutable" if content_hash else "no-cache"
+    headers = {
+        "ETag": etag,
+        "Last-Modified": last_modified,
+        "Cache-Control": f"{'private' if private else 'public'}, {caching}",
+        "Accept-Ranges": "bytes"
+    }
     
-    return {"message": "Report rejected"}
+    if_none_match = request.headers.get("if-none-match")
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_none_match is not None:
+        if _etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+    elif if_modified_since:
+        try:
+            if int(stat.st_mtime) <= parsedate_to_datetime(if_modified_since).timestamp():
+                return Response(status_code=304, headers=headers)
+        except (TypeError, ValueError):
+            pass
+    
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    # If-Range needs a strong validator match, otherwise the whole file is resent
+    range_allowed = if_range is None or if_range == last_modified or (if_range == etag and not etag.startswith("W/"))
+    if range_header and range_allowed:
+        byte_range = _parse_range(range_header, stat.st_size)
+        if byte_range:
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{stat.st_size}"
+            headers["Content-Length"] = str(end - start + 1)
+            if filename:
+                headers["Content-Disposition"] = f"attachment; filename*=utf-8''{quote(filename)}"
+            return StreamingResponse(
+                _iter_file_range(path, start, end - start + 1),
+                status_code=206,
+                headers=headers,
+                media_type=media_type
+            )
+    
+    return FileResponse(path=path, headers=headers, media_type=media_type, filename=filename, stat_result=stat)
 
 # ==================== TOOL ROUTES ====================
 
@@ -632,16 +1878,7 @@ async def upload_tool(
     file: UploadFile = File(...),
     user: dict = Depends(require_roles([UserRole.ADMIN]))
 ):
-    upload_dir = ROOT_DIR / "uploads" / "tools"
-    upload_dir.mkdir(parents=True, exist_ok=True)
-    
-    file_id = str(uuid.uuid4())
-    file_extension = Path(file.filename).suffix
-    file_path = upload_dir / f"{file_id}{file_extension}"
-    
-    with open(file_path, "wb") as f:
-        content = await file.read()
-        f.write(content)
+    blob = await store_blob(file, MAX_TOOL_UPLOAD_BYTES, "application/octet-stream")
     
     tool_id = str(uuid.uuid4())
     tool_doc = {
@@ -650,17 +1887,26 @@ async def upload_tool(
         "description": description,
         "category": category,
         "url": None,
-        "file_path": str(file_path),
+        "file_path": str(blob["path"]),
+        "file_name": file.filename,
+        "file_size": blob["size"],
+        "blob_id": blob["blob_id"],
         "is_file": True,
         "created_by": user["id"],
         "created_at": datetime.now(timezone.utc).isoformat()
     }
     
-    await db.tools.insert_one(tool_doc)
+    await insert_blob_owner(db.tools, tool_doc)
     return ToolResponse(**tool_doc)
 
 @api_router.get("/tools", response_model=List[ToolResponse])
-async def get_tools(category: Optional[str] = None, user: dict = Depends(get_current_user)):
+async def get_tools(
+    response: Response,
+    category: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+    user: dict = Depends(get_current_user)
+):
     if user["role"] == UserRole.EXTERNO:
         raise HTTPException(status_code=403, detail="External users cannot access tools")
     
@@ -668,37 +1914,55 @@ async def get_tools(category: Optional[str] = None, user: dict = Depends(get_cur
     if category:
         query["category"] = category
     
-    tools = await db.tools.find(query, {"_id": 0}).to_list(1000)
-    return [ToolResponse(**t) for t in tools]
+    tools = await fetch_page(db.tools, query, model_projection(ToolResponse), cursor, limit, response)
+    return list_response(tools, ToolResponse, response)
 
 @api_router.delete("/tools/{tool_id}")
 async def delete_tool(tool_id: str, user: dict = Depends(require_roles([UserRole.ADMIN]))):
-    tool = await db.tools.find_one({"id": tool_id}, {"_id": 0})
+    # Only the request that actually deletes the tool releases its blob, so a double
+    # delete cannot drop a reference another tool with the same content still holds
+    tool = await db.tools.find_one_and_delete({"id": tool_id}, projection={"_id": 0, "blob_id": 1, "file_path": 1})
     if not tool:
         raise HTTPException(status_code=404, detail="Tool not found")
     
-    if tool.get("file_path"):
+    if tool.get("blob_id"):
+        await release_blob(tool["blob_id"])
+    elif tool.get("file_path"):
         try:
             os.remove(tool["file_path"])
         except Exception:
             pass
     
-    await db.tools.delete_one({"id": tool_id})
     return {"message": "Tool deleted"}
 
 # ==================== CHAT ROUTES ====================
 
 @api_router.get("/chat/messages", response_model=List[ChatResponse])
-async def get_chat_messages(limit: int = 50, user: dict = Depends(get_current_user)):
-    messages = await db.chat_messages.find({}, {"_id": 0}).sort("created_at", -1).limit(limit).to_list(limit)
-    messages.reverse()
-    # Add default role for old messages without role
-    for m in messages:
-        if "role" not in m:
-            m["role"] = "externo"
-        if "image_url" not in m:
-            m["image_url"] = None
-    return [ChatResponse(**m) for m in messages]
+async def get_chat_messages(
+    limit: int = Query(50, ge=1, le=PAGE_SIZE_MAX),
+    since: Optional[str] = None,
+    before: Optional[str] = None,
+    user: dict = Depends(get_current_user)
+):
+    if since and before:
+        raise HTTPException(status_code=400, detail="Use either since or before, not both")
+    
+    query = {}
+    anchor_id = since or before
+    if anchor_id:
+        anchor = await db.chat_messages.find_one({"id": anchor_id}, {"_id": 0, "id": 1, "created_at": 1})
+        if not anchor:
+            raise HTTPException(status_code=404, detail="Message not found")
+        query = keyset_query(anchor, "$gt" if since else "$lt")
+    
+    projection = model_projection(ChatResponse)
+    if since:
+        # Oldest first: the next `limit` messages after the anchor
+        messages = await db.chat_messages.find(query, projection).sort(PAGE_SORT_ASC).limit(limit).to_list(limit)
+    else:
+        messages = await db.chat_messages.find(query, projection).sort(PAGE_SORT).limit(limit).to_list(limit)
+        messages.reverse()
+    return list_response(messages, ChatResponse)
 
 @api_router.post("/chat/send", response_model=ChatResponse)
 async def send_chat_message(message: ChatMessage, user: dict = Depends(get_current_user)):
@@ -709,111 +1973,609 @@ async def send_chat_message(message: ChatMessage, user: dict = Depends(get_curre
         "username": user["username"],
         "role": user["role"],
         "content": message.content,
+        "image_url": None,
         "is_ai": False,
         "created_at": datetime.now(timezone.utc).isoformat()
     }
     
     await db.chat_messages.insert_one(message_doc)
+    publish_chat_event("message", message_doc)
     return ChatResponse(**message_doc)
 
-@api_router.post("/chat/ai", response_model=ChatResponse)
-async def chat_with_ai(message: ChatMessage, user: dict = Depends(get_current_user)):
+AI_SYSTEM_MESSAGE = """Você é um assistente de IA especializado em cibersegurança para a equipe The Admins. 
+            Você ajuda os membros com:
+            - Análise de sites suspeitos
+            - Identificação de golpes e fraudes
+            - Técnicas de investigação cibernética
+            - Ferramentas de segurança
+            - Procedimentos de denúncia
+            Seja profissional, técnico e útil. Responda em português brasileiro."""
+AI_STREAM_HEARTBEAT = float(os.environ.get('AI_STREAM_HEARTBEAT', 15))
+AI_CACHE_SIZE = int(os.environ.get('AI_CACHE_SIZE', 1000))
+AI_CACHE_TTL = float(os.environ.get('AI_CACHE_TTL', 3600))
+
+ai_stream_stats = {"active": 0, "completed": 0, "cancelled": 0, "failed": 0, "ttfb_ms_last": None}
+
+# Answers keyed by normalized question. Identical questions asked while one is already
+# being answered share the same upstream stream instead of starting another.
+ai_response_cache = TTLCache(maxsize=AI_CACHE_SIZE, ttl=AI_CACHE_TTL)
+ai_inflight = {}
+ai_cache_stats = {"hits": 0, "misses": 0, "coalesced": 0, "upstream_errors": 0}
+
+def normalize_prompt(content: str) -> str:
+    text = unicodedata.normalize("NFKC", content).casefold()
+    return re.sub(r"\s+", " ", text).strip(" ?!.")
+
+async def ask_llm(user_id: str, content: str) -> str:
     from emergentintegrations.llm.chat import LlmChat, UserMessage
     
-    user_message_id = str(uuid.uuid4())
-    user_message_doc = {
-        "id": user_message_id,
+    chat = LlmChat(
+        api_key=os.environ.get('EMERGENT_LLM_KEY'),
+        session_id=f"theadmins-chat-{user_id}",
+        system_message=AI_SYSTEM_MESSAGE
+    ).with_model("openai", "gpt-5.2")
+    return await chat.send_message(UserMessage(text=content))
+
+async def stream_llm(user_id: str, content: str):
+    # Provider seam: emergentintegrations only exposes a blocking send_message, so the reply
+    # arrives as one chunk. A streaming client only has to change this generator.
+    yield await ask_llm(user_id, content)
+
+async def _pump_llm(key: str, flight: dict, user_id: str, content: str) -> str:
+    # Settles the cache and ai_inflight before the task completes, so a caller arriving
+    # right after the last chunk finds the cached answer rather than a finished flight
+    try:
+        async for chunk in stream_llm(user_id, content):
+            flight["chunks"].append(chunk)
+            # Swap the event before setting the old one so readers never miss a chunk
+            changed, flight["changed"] = flight["changed"], asyncio.Event()
+            changed.set()
+    except asyncio.CancelledError:
+        raise
+    except Exception:
+        ai_cache_stats["upstream_errors"] += 1
+        raise
+    else:
+        answer = "".join(flight["chunks"])
+        if answer:
+            ai_response_cache[key] = answer
+        return answer
+    finally:
+        if ai_inflight.get(key) is flight:
+            del ai_inflight[key]
+        flight["changed"].set()
+
+def ai_cache_metrics() -> dict:
+    lookups = ai_cache_stats["hits"] + ai_cache_stats["misses"] + ai_cache_stats["coalesced"]
+    return {
+        **ai_cache_stats,
+        "hit_rate": round(ai_cache_stats["hits"] / lookups, 4) if lookups else 0.0,
+        # Share of questions answered without an upstream call of their own
+        "upstream_saved_rate": round((lookups - ai_cache_stats["misses"]) / lookups, 4) if lookups else 0.0,
+        "size": len(ai_response_cache),
+        "max_size": AI_CACHE_SIZE,
+        "ttl": AI_CACHE_TTL,
+        "in_flight": len(ai_inflight)
+    }
+
+async def ai_reply_chunks(user_id: str, content: str):
+    """Yield the assistant's reply as text chunks.
+    
+    Cache hits come back whole. On a miss the upstream reply is shared by everyone asking
+    the same question while it runs: each caller replays the chunks received so far and then
+    follows along live, and the joined reply is cached once the stream ends. The upstream
+    call is cancelled when the last caller following it goes away.
+    """
+    key = normalize_prompt(content)
+    answer = ai_response_cache.get(key)
+    if answer is not None:
+        ai_cache_stats["hits"] += 1
+        yield answer
+        return
+    
+    flight = ai_inflight.get(key)
+    if flight is None:
+        ai_cache_stats["misses"] += 1
+        flight = {"chunks": [], "changed": asyncio.Event(), "waiters": 0}
+        flight["task"] = asyncio.create_task(_pump_llm(key, flight, user_id, content))
+        ai_inflight[key] = flight
+    else:
+        ai_cache_stats["coalesced"] += 1
+    
+    flight["waiters"] += 1
+    sent = 0
+    try:
+        while True:
+            changed = flight["changed"]
+            while sent < len(flight["chunks"]):
+                yield flight["chunks"][sent]
+                sent += 1
+            if flight["task"].done():
+                # Re-raises an upstream failure for every caller sharing it
+                flight["task"].result()
+                return
+            await changed.wait()
+    finally:
+        flight["waiters"] -= 1
+        if flight["waiters"] == 0 and not flight["task"].done():
+            # Last interested caller is gone: abort upstream and let the next ask start fresh
+            if ai_inflight.get(key) is flight:
+                del ai_inflight[key]
+            flight["task"].cancel()
+
+async def cached_ai_reply(user_id: str, content: str) -> str:
+    return "".join([chunk async for chunk in ai_reply_chunks(user_id, content)])
+
+async def store_user_chat_message(user: dict, content: str) -> dict:
+    message_doc = {
+        "id": str(uuid.uuid4()),
         "user_id": user["id"],
         "username": user["username"],
         "role": user["role"],
-        "content": message.content,
+        "content": content,
+        "image_url": None,
         "is_ai": False,
         "created_at": datetime.now(timezone.utc).isoformat()
     }
-    await db.chat_messages.insert_one(user_message_doc)
-    
-    try:
-        api_key = os.environ.get('EMERGENT_LLM_KEY')
-        chat = LlmChat(
-            api_key=api_key,
-            session_id=f"theadmins-chat-{user['id']}",
-            system_message="""Você é um assistente de IA especializado em cibersegurança para a equipe The Admins. 
-            Você ajuda os membros com:
-            - Análise de sites suspeitos
-            - Identificação de golpes e fraudes
-            - Técnicas de investigação cibernética
-            - Ferramentas de segurança
-            - Procedimentos de denúncia
-            Seja profissional, técnico e útil. Responda em português brasileiro."""
-        ).with_model("openai", "gpt-5.2")
+    await db.chat_messages.insert_one(message_doc)
+    publish_chat_event("message", message_doc)
+    return message_doc
+
+async def store_ai_chat_message(content: str) -> dict:
+    message_doc = {
+        "id": str(uuid.uuid4()),
+        "user_id": "ai-assistant",
+        "username": "ARIA",
+        "role": "ai",
+        "content": content,
+        "image_url": None,
+        "is_ai": True,
+        "created_at": datetime.now(timezone.utc).isoformat()
+    }
+    await db.chat_messages.insert_one(message_doc)
+    publish_chat_event("message", message_doc)
+    return message_doc
+
+@api_router.post("/chat/ai", response_model=ChatResponse)
+async def chat_with_ai(message: ChatMessage, user: dict = Depends(get_current_user)):
+    async with chat_ai_limiter.limit(user["id"]):
+        await store_user_chat_message(user, message.content)
         
-        user_msg = UserMessage(text=message.content)
-        ai_response = await chat.send_message(user_msg)
+        try:
+            ai_response = await cached_ai_reply(user["id"], message.content)
+            ai_message_doc = await store_ai_chat_message(ai_response)
+            return ChatResponse(**ai_message_doc)
+        except Exception as e:
+            logger.error(f"AI Chat error: {str(e)}")
+            raise HTTPException(status_code=500, detail="Failed to get AI response")
+
+async def ai_event_stream(user: dict, content: str, release):
+    started = time.monotonic()
+    ai_stream_stats["active"] += 1
+    outcome = "cancelled"
+    try:
+        user_message_doc = await store_user_chat_message(user, content)
+        yield _sse_event("start", {"message": ChatResponse(**user_message_doc).model_dump()})
         
-        ai_message_id = str(uuid.uuid4())
-        ai_message_doc = {
-            "id": ai_message_id,
-            "user_id": "ai-assistant",
-            "username": "ARIA",
-            "role": "ai",
-            "content": ai_response,
-            "is_ai": True,
-            "created_at": datetime.now(timezone.utc).isoformat()
-        }
-        await db.chat_messages.insert_one(ai_message_doc)
+        # The upstream call runs in a task so heartbeats keep proxies from timing out
+        # the connection while the model is thinking
+        chunks = ai_reply_chunks(user["id"], content).__aiter__()
+        parts = []
+        next_chunk = asyncio.ensure_future(chunks.__anext__())
+        try:
+            while True:
+                done, _ = await asyncio.wait({next_chunk}, timeout=AI_STREAM_HEARTBEAT)
+                if not done:
+                    yield ": keep-alive\n\n"
+                    continue
+                try:
+                    chunk = next_chunk.result()
+                except StopAsyncIteration:
+                    break
+                if not parts:
+                    # Time to the first token of the reply, not to the echo of the question
+                    ai_stream_stats["ttfb_ms_last"] = round((time.monotonic() - started) * 1000, 1)
+                parts.append(chunk)
+                yield _sse_event("token", {"text": chunk})
+                next_chunk = asyncio.ensure_future(chunks.__anext__())
+        finally:
+            # On client disconnect Starlette cancels this generator; abort the upstream call too
+            if not next_chunk.done():
+                next_chunk.cancel()
+                await asyncio.gather(next_chunk, return_exceptions=True)
+            await chunks.aclose()
         
-        return ChatResponse(**ai_message_doc)
+        # Persisted once, after the full reply; cancelled streams store nothing
+        ai_message_doc = await store_ai_chat_message("".join(parts))
+        outcome = "completed"
+        yield _sse_event("done", {"message": ChatResponse(**ai_message_doc).model_dump()}, ai_message_doc["id"])
     except Exception as e:
-        logger.error(f"AI Chat error: {str(e)}")
-        raise HTTPException(status_code=500, detail="Failed to get AI response")
+        outcome = "failed"
+        logger.error(f"AI Chat stream error: {str(e)}")
+        yield _sse_event("error", {"detail": "Failed to get AI response"})
+    finally:
+        release()
+        ai_stream_stats["active"] -= 1
+        ai_stream_stats[outcome] += 1
+
+@api_router.post("/chat/ai/stream")
+async def chat_with_ai_stream(message: ChatMessage, user: dict = Depends(get_current_user)):
+    # Admitted before the response starts so a rejection is a plain 429/503. The slot is
+    # held until the stream ends; the background task releases it if the stream never ran.
+    release = await chat_ai_limiter.admit(user["id"])
+    return StreamingResponse(
+        ai_event_stream(user, message.content, release),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(release)
+    )
 
-# ==================== STATS ROUTES ====================
+# ==================== COUNTERS ====================
 
-@api_router.get("/stats")
-async def get_stats(user: dict = Depends(get_current_user)):
-    total_missions = await db.missions.count_documents({})
-    completed_missions = await db.missions.count_documents({"status": MissionStatus.COMPLETED})
-    in_progress_missions = await db.missions.count_documents({"status": MissionStatus.IN_PROGRESS})
-    pending_missions = await db.missions.count_documents({"status": MissionStatus.PENDING})
+# Dashboard counters live in one document that write paths update with $inc, so the stats
+# endpoints are a single read. reconcile_counters() recounts everything and fixes drift.
+COUNTERS_ID = "dashboard"
+COUNTERS_RECONCILE_INTERVAL = float(os.environ.get('COUNTERS_RECONCILE_INTERVAL', 3600))
+
+def _counter_key(value) -> str:
+    # Field names may not contain '.' or start with '$'
+    return str(value).replace(".", "_").replace("$", "_")
+
+def _mission_counter_fields(mission: dict) -> List[str]:
+    fields = [
+        "missions.total",
+        f"missions.{_counter_key(mission.get('status'))}",
+        f"missions_by_category.{_counter_key(mission.get('category'))}"
+    ]
+    if mission.get("site_status") in (0, 404):
+        fields.append("sites_down")
+    return fields
+
+def _report_counter_fields(report: dict) -> List[str]:
+    return [
+        "reports.total",
+        f"reports.{_counter_key(report.get('status'))}",
+        f"reports_by_category.{_counter_key(report.get('category'))}"
+    ]
+
+def _user_counter_fields(user: dict) -> List[str]:
+    fields = ["users.total"]
+    if user.get("role") != UserRole.EXTERNO:
+        fields.append("users.active_members")
+    return fields
+
+COUNTER_FIELDS = {
+    "missions": _mission_counter_fields,
+    "reports": _report_counter_fields,
+    "users": _user_counter_fields
+}
+
+def counter_delta(kind: str, before: Optional[dict] = None, after: Optional[dict] = None) -> dict:
+    # Removes the contribution of `before` and adds the one of `after`
+    delta = {}
+    for doc, sign in ((before, -1), (after, 1)):
+        if doc:
+            for field in COUNTER_FIELDS[kind](doc):
+                delta[field] = delta.get(field, 0) + sign
+    return {field: value for field, value in delta.items() if value}
+
+async def increment_counters(*deltas: dict):
+    merged = {}
+    for delta in deltas:
+        for field, value in delta.items():
+            merged[field] = merged.get(field, 0) + value
+    merged = {field: value for field, value in merged.items() if value}
+    if merged:
+        await db.counters.update_one({"_id": COUNTERS_ID}, {"$inc": merged}, upsert=True)
+
+async def recount_counters() -> dict:
+    missions, reports, users = await asyncio.gather(
+        db.missions.aggregate([{"$facet": {
+            "total": [{"$count": "n"}],
+            "by_status": [{"$group": {"_id": "$status", "n": {"$sum": 1}}}],
+            "by_category": [{"$group": {"_id": "$category", "n": {"$sum": 1}}}],
+            "sites_down": [{"$match": {"site_status": {"$in": [0, 404]}}}, {"$count": "n"}]
+        }}]).to_list(1),
+        db.reports.aggregate([{"$facet": {
+            "total": [{"$count": "n"}],
+            "by_status": [{"$group": {"_id": "$status", "n": {"$sum": 1}}}],
+            "by_category": [{"$group": {"_id": "$category", "n": {"$sum": 1}}}]
+        }}]).to_list(1),
+        db.users.aggregate([{"$facet": {
+            "total": [{"$count": "n"}],
+            "active_members": [{"$match": {"role": {"$ne": UserRole.EXTERNO}}}, {"$count": "n"}]
+        }}]).to_list(1)
+    )
+    missions, reports, users = missions[0], reports[0], users[0]
     
-    total_reports = await db.reports.count_documents({})
-    pending_reports = await db.reports.count_documents({"status": ReportStatus.PENDING})
+    return {
+        "missions": {
+            "total": _facet_count(missions, "total"),
+            **{_counter_key(item["_id"]): item["n"] for item in missions["by_status"]}
+        },
+        "missions_by_category": {_counter_key(item["_id"]): item["n"] for item in missions["by_category"]},
+        "sites_down": _facet_count(missions, "sites_down"),
+        "reports": {
+            "total": _facet_count(reports, "total"),
+            **{_counter_key(item["_id"]): item["n"] for item in reports["by_status"]}
+        },
+        "reports_by_category": {_counter_key(item["_id"]): item["n"] for item in reports["by_category"]},
+        "users": {
+            "total": _facet_count(users, "total"),
+            "active_members": _facet_count(users, "active_members")
+        }
+    }
+
+def _flatten_counters(doc: dict, prefix: str = "") -> dict:
+    flat = {}
+    for key, value in doc.items():
+        if key == "_id":
+            continue
+        if isinstance(value, dict):
+            flat.update(_flatten_counters(value, f"{prefix}{key}."))
+        else:
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+async def reconcile_counters() -> List[dict]:
+    # Writes racing with the recount can leave a small drift; the next run corrects it
+    stored = await db.counters.find_one({"_id": COUNTERS_ID}) or {}
+    actual = await recount_counters()
+    
+    stored_flat = _flatten_counters(stored)
+    actual_flat = _flatten_counters(actual)
+    drift = [
+        {"counter": field, "stored": stored_flat.get(field, 0), "actual": actual_flat.get(field, 0)}
+        for field in sorted(set(stored_flat) | set(actual_flat))
+        if stored_flat.get(field, 0) != actual_flat.get(field, 0)
+    ]
     
-    total_users = await db.users.count_documents({})
-    active_members = await db.users.count_documents({"role": {"$ne": UserRole.EXTERNO}})
+    await db.counters.replace_one({"_id": COUNTERS_ID}, actual, upsert=True)
+    ttl_cache.pop("stats", None)
+    if drift:
+        logger.warning(f"Counter drift corrected: {drift}")
+    return drift
+
+async def get_counters() -> dict:
+    counters = await db.counters.find_one({"_id": COUNTERS_ID})
+    if counters is None:
+        await reconcile_counters()
+        counters = await db.counters.find_one({"_id": COUNTERS_ID}) or {}
+    return counters
+
+async def background_counter_reconcile():
+    while True:
+        try:
+            await reconcile_counters()
+        except Exception as e:
+            logger.error(f"Counter reconciliation error: {str(e)}")
+        await asyncio.sleep(COUNTERS_RECONCILE_INTERVAL)
+
+# ==================== STREAM FAN-OUT ====================
+
+def fan_out(subscribers: set, item):
+    # Each open stream owns a bounded queue and publishing never waits. A stream whose queue
+    # is full is a slow consumer: it is unsubscribed, its backlog dropped and a None sentinel
+    # queued so it closes and the client reconnects and resumes from its last id.
+    for queue in list(subscribers):
+        try:
+            queue.put_nowait(item)
+        except asyncio.QueueFull:
+            subscribers.discard(queue)
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(None)
+
+# ==================== CHAT WEBSOCKET ====================
+
+# Every connection subscribes through fan_out; a slow consumer is closed with
+# CHAT_WS_SLOW_CONSUMER_CODE and the client reconnects with last_id.
+CHAT_WS_QUEUE_SIZE = int(os.environ.get('CHAT_WS_QUEUE_SIZE', 100))
+CHAT_WS_RESUME_LIMIT = int(os.environ.get('CHAT_WS_RESUME_LIMIT', 200))
+CHAT_WS_SLOW_CONSUMER_CODE = 1013
+
+chat_subscribers = set()
+chat_ws_stats = {"connections": 0, "published": 0, "dropped_slow": 0}
+
+def _chat_event(event_type: str, message_doc: dict) -> str:
+    return json.dumps({"type": event_type, "data": ChatResponse(**message_doc).model_dump()})
+
+def publish_chat_event(event_type: str, message_doc: dict):
+    if not chat_subscribers:
+        return
+    # Serialized once for every subscriber; "message" events carry the id used to skip resume duplicates
+    item = (message_doc["id"] if event_type == "message" else None, _chat_event(event_type, message_doc))
+    chat_ws_stats["published"] += 1
+    fan_out(chat_subscribers, item)
+
+async def _chat_ws_sender(websocket: WebSocket, queue: asyncio.Queue, sent_ids: set):
+    while True:
+        item = await queue.get()
+        if item is None:
+            chat_ws_stats["dropped_slow"] += 1
+            await websocket.close(code=CHAT_WS_SLOW_CONSUMER_CODE)
+            return
+        message_id, payload = item
+        if message_id in sent_ids:
+            continue
+        await websocket.send_text(payload)
+
+async def _chat_ws_receiver(websocket: WebSocket):
+    # Client frames are ignored; receiving only detects disconnects
+    while True:
+        await websocket.receive_text()
+
+@api_router.websocket("/chat/ws")
+async def chat_websocket(websocket: WebSocket, ticket: str, last_id: Optional[str] = None):
+    try:
+        await authenticate_token(ticket, purpose="stream")
+    except HTTPException:
+        await websocket.close(code=1008)
+        return
+    
+    await websocket.accept()
+    queue = asyncio.Queue(maxsize=CHAT_WS_QUEUE_SIZE)
+    # Subscribe before the resume query so nothing published in between is lost
+    chat_subscribers.add(queue)
+    chat_ws_stats["connections"] += 1
+    try:
+        sent_ids = set()
+        if last_id:
+            anchor = await db.chat_messages.find_one({"id": last_id}, {"_id": 0, "id": 1, "created_at": 1})
+            if anchor:
+                missed = await db.chat_messages.find(
+                    keyset_query(anchor, "$gt"),
+                    {"_id": 0}
+                ).sort(PAGE_SORT_ASC).limit(CHAT_WS_RESUME_LIMIT).to_list(CHAT_WS_RESUME_LIMIT)
+                for message_doc in missed:
+                    await websocket.send_text(_chat_event("message", message_doc))
+                    sent_ids.add(message_doc["id"])
+        
+        tasks = {
+            asyncio.create_task(_chat_ws_sender(websocket, queue, sent_ids)),
+            asyncio.create_task(_chat_ws_receiver(websocket))
+        }
+        _, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        chat_subscribers.discard(queue)
+        chat_ws_stats["connections"] -= 1
+
+# ==================== STATS ROUTES ====================
+
+# In-process TTL cache; concurrent misses on the same key wait for a single recomputation
+STATS_CACHE_TTL = float(os.environ.get('STATS_CACHE_TTL', 10))
+
+ttl_cache = {}
+ttl_cache_locks = {}
+
+async def get_or_compute(key: str, ttl: float, compute):
+    entry = ttl_cache.get(key)
+    if entry and entry[0] > time.monotonic():
+        return entry[1]
     
-    sites_down = await db.missions.count_documents({"site_status": {"$in": [0, 404]}})
+    lock = ttl_cache_locks.setdefault(key, asyncio.Lock())
+    async with lock:
+        entry = ttl_cache.get(key)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+        value = await compute()
+        ttl_cache[key] = (time.monotonic() + ttl, value)
+        return value
+
+def _facet_count(result: dict, facet: str) -> int:
+    return result[facet][0]["n"] if result.get(facet) else 0
+
+async def compute_stats() -> dict:
+    counters = await get_counters()
+    missions = counters.get("missions", {})
+    reports = counters.get("reports", {})
+    users = counters.get("users", {})
     
     return {
         "missions": {
-            "total": total_missions,
-            "completed": completed_missions,
-            "in_progress": in_progress_missions,
-            "pending": pending_missions
+            "total": missions.get("total", 0),
+            "completed": missions.get(MissionStatus.COMPLETED, 0),
+            "in_progress": missions.get(MissionStatus.IN_PROGRESS, 0),
+            "pending": missions.get(MissionStatus.PENDING, 0)
         },
         "reports": {
-            "total": total_reports,
-            "pending": pending_reports
+            "total": reports.get("total", 0),
+            "pending": reports.get(ReportStatus.PENDING, 0)
         },
         "users": {
-            "total": total_users,
-            "active_members": active_members
+            "total": users.get("total", 0),
+            "active_members": users.get("active_members", 0)
         },
-        "sites_down": sites_down
+        "sites_down": counters.get("sites_down", 0)
     }
 
+@api_router.get("/stats")
+async def get_stats(user: dict = Depends(get_current_user)):
+    return await get_or_compute("stats", STATS_CACHE_TTL, compute_stats)
+
 @api_router.get("/stats/categories")
 async def get_category_stats(user: dict = Depends(get_current_user)):
-    pipeline = [
-        {"$group": {"_id": "$category", "count": {"$sum": 1}}}
-    ]
-    
-    mission_stats = await db.missions.aggregate(pipeline).to_list(100)
-    report_stats = await db.reports.aggregate(pipeline).to_list(100)
-    
+    counters = await get_counters()
+    return {
+        "missions_by_category": {k: v for k, v in counters.get("missions_by_category", {}).items() if v},
+        "reports_by_category": {k: v for k, v in counters.get("reports_by_category", {}).items() if v}
+    }
+
+@api_router.get("/stats/user-cache")
+async def get_user_cache_stats(user: dict = Depends(require_roles([UserRole.ADMIN]))):
+    lookups = user_cache_stats["hits"] + user_cache_stats["misses"]
     return {
-        "missions_by_category": {item["_id"]: item["count"] for item in mission_stats},
-        "reports_by_category": {item["_id"]: item["count"] for item in report_stats}
+        **user_cache_stats,
+        "hit_rate": round(user_cache_stats["hits"] / lookups, 4) if lookups else 0.0,
+        "size": len(user_cache),
+        "max_size": USER_CACHE_SIZE,
+        "ttl_seconds": USER_CACHE_TTL
+    }
+
+@api_router.get("/stats/leaderboard")
+async def get_leaderboard_stats(user: dict = Depends(require_roles([UserRole.ADMIN]))):
+    return {**leaderboard_stats, "ranked_users": len(leaderboard), "resync_interval": LEADERBOARD_RESYNC_INTERVAL}
+
+@api_router.get("/stats/ai")
+async def get_ai_stats(user: dict = Depends(require_roles([UserRole.ADMIN]))):
+    return {**ai_stream_stats, "cache": ai_cache_metrics()}
+
+@api_router.get("/stats/limits")
+async def get_limit_stats(user: dict = Depends(require_roles([UserRole.ADMIN]))):
+    return {
+        "store": RATE_LIMIT_STORE,
+        "limiters": {limiter.name: limiter.snapshot() for limiter in LIMITERS}
+    }
+
+@api_router.get("/stats/bcrypt")
+async def get_bcrypt_stats(user: dict = Depends(require_roles([UserRole.ADMIN]))):
+    return {
+        **bcrypt_stats,
+        "queue_depth": max(bcrypt_stats["pending"] - BCRYPT_POOL_SIZE, 0),
+        "pool_size": BCRYPT_POOL_SIZE,
+        "max_queue": BCRYPT_MAX_QUEUE,
+        "rounds": BCRYPT_ROUNDS
+    }
+
+@api_router.get("/stats/blobs")
+async def get_blob_stats(user: dict = Depends(require_roles([UserRole.ADMIN]))):
+    # Logical bytes count every reference, stored bytes count each blob once
+    result = await db.blobs.aggregate([{"$group": {
+        "_id": None,
+        "blobs": {"$sum": 1},
+        "references": {"$sum": {"$max": ["$refs", 0]}},
+        "stored_bytes": {"$sum": "$size"},
+        "logical_bytes": {"$sum": {"$multiply": ["$size", {"$max": ["$refs", 0]}]}},
+        "unreferenced": {"$sum": {"$cond": [{"$lte": ["$refs", 0]}, 1, 0]}}
+    }}]).to_list(1)
+    totals = result[0] if result else {"blobs": 0, "references": 0, "stored_bytes": 0, "logical_bytes": 0, "unreferenced": 0}
+    totals.pop("_id", None)
+    return {**totals, "saved_bytes": max(totals["logical_bytes"] - totals["stored_bytes"], 0)}
+
+@api_router.get("/stats/chat")
+async def get_chat_ws_stats(user: dict = Depends(require_roles([UserRole.ADMIN]))):
+    return {**chat_ws_stats, "queue_size": CHAT_WS_QUEUE_SIZE}
+
+@api_router.get("/stats/notifications")
+async def get_notification_sse_stats(user: dict = Depends(require_roles([UserRole.ADMIN]))):
+    return {**notification_sse_stats, "users_connected": len(notification_subscribers)}
+
+@api_router.post("/stats/reconcile")
+async def reconcile_stats(user: dict = Depends(require_roles([UserRole.ADMIN]))):
+    drift = await reconcile_counters()
+    return {"drift": drift, "in_sync": not drift}
+
+@api_router.get("/stats/indexes")
+async def get_index_report(user: dict = Depends(require_roles([UserRole.ADMIN]))):
+    report = await explain_hot_queries()
+    return {
+        "queries": report,
+        "unindexed": [entry["query"] for entry in report if not entry["indexed"]]
     }
 
 # ==================== BADGES ROUTES ====================
@@ -830,29 +2592,43 @@ BADGES = [
     {"id": "points_5000", "name": "Mestre", "description": "Alcançou 5000 pontos", "icon": "star", "requirement_type": "points", "requirement_value": 5000},
 ]
 
+# Counter on the user document that each badge requirement_type is checked against.
+BADGE_USER_FIELDS = {"missions": "missions_completed", "reports": "reports_submitted", "points": "rank_points"}
+
+# Badges grouped by requirement type and sorted by threshold, so evaluation can
+# stop at the first threshold a user has not reached yet.
+BADGE_TABLE = {
+    requirement_type: sorted(
+        (badge for badge in BADGES if badge["requirement_type"] == requirement_type),
+        key=lambda badge: badge["requirement_value"],
+    )
+    for requirement_type in BADGE_USER_FIELDS
+}
+BADGE_USER_PROJECTION = {"_id": 0, **{field: 1 for field in BADGE_USER_FIELDS.values()}}
+
+def evaluate_badges(user: dict) -> List[dict]:
+    """Return every badge whose threshold the user's counters satisfy (no I/O)."""
+    earned = []
+    for requirement_type, badges in BADGE_TABLE.items():
+        value = user.get(BADGE_USER_FIELDS[requirement_type], 0)
+        for badge in badges:
+            if value < badge["requirement_value"]:
+                break
+            earned.append(badge)
+    return earned
+
 @api_router.get("/badges")
 async def get_all_badges(user: dict = Depends(get_current_user)):
     return BADGES
 
 @api_router.get("/badges/user/{user_id}")
 async def get_user_badges(user_id: str, user: dict = Depends(get_current_user)):
-    target_user = await db.users.find_one({"id": user_id}, {"_id": 0})
-    if not target_user:
+    target_user = await db.users.find_one({"id": user_id}, BADGE_USER_PROJECTION)
+    if target_user is None:
         raise HTTPException(status_code=404, detail="User not found")
-    
-    earned_badges = []
-    for badge in BADGES:
-        if badge["requirement_type"] == "missions" and target_user.get("missions_completed", 0) >= badge["requirement_value"]:
-            earned_badges.append(badge)
-        elif badge["requirement_type"] == "reports" and target_user.get("reports_submitted", 0) >= badge["requirement_value"]:
-            earned_badges.append(badge)
-        elif badge["requirement_type"] == "points" and target_user.get("rank_points", 0) >= badge["requirement_value"]:
-            earned_badges.append(badge)
-    
-    return earned_badges
+    return evaluate_badges(target_user)
 
 # ==================== FILE UPLOAD FOR TOOLS ====================
-from fastapi.responses import FileResponse
 import shutil
 
 UPLOAD_DIR = ROOT_DIR / "uploads" / "tools"
@@ -874,16 +2650,8 @@ async def upload_tool_file(
     file: UploadFile = File(...),
     user: dict = Depends(require_roles([UserRole.ADMIN]))
 ):
-    # Generate unique filename
-    file_id = str(uuid.uuid4())
-    file_extension = Path(file.filename).suffix if file.filename else ""
-    filename = f"{file_id}{file_extension}"
-    file_path = UPLOAD_DIR / filename
-    
     # Save file
-    content = await file.read()
-    with open(file_path, "wb") as buffer:
-        buffer.write(content)
+    blob = await store_blob(file, MAX_TOOL_UPLOAD_BYTES, "application/octet-stream")
     
     # Create tool entry
     tool_id = str(uuid.uuid4())
@@ -893,18 +2661,20 @@ async def upload_tool_file(
         "description": description,
         "category": category,
         "url": None,
-        "file_path": str(file_path),
+        "file_path": str(blob["path"]),
         "file_name": file.filename,
+        "file_size": blob["size"],
+        "blob_id": blob["blob_id"],
         "is_file": True,
         "created_by": user["id"],
         "created_at": datetime.now(timezone.utc).isoformat()
     }
     
-    await db.tools.insert_one(tool_doc)
+    await insert_blob_owner(db.tools, tool_doc)
     return {"id": tool_id, "message": "Tool uploaded successfully", "filename": file.filename}
 
 @api_router.get("/tools/download/{tool_id}")
-async def download_tool(tool_id: str, user: dict = Depends(get_current_user)):
+async def download_tool(tool_id: str, request: Request, user: dict = Depends(get_current_user)):
     if user["role"] == UserRole.EXTERNO:
         raise HTTPException(status_code=403, detail="External users cannot download tools")
     
@@ -919,16 +2689,20 @@ async def download_tool(tool_id: str, user: dict = Depends(get_current_user)):
     if not file_path.exists():
         raise HTTPException(status_code=404, detail="File not found")
     
-    return FileResponse(
-        path=file_path,
+    return file_response(
+        request,
+        file_path,
+        content_hash=tool.get("blob_id"),
+        media_type="application/octet-stream",
         filename=tool.get("file_name", file_path.name),
-        media_type="application/octet-stream"
+        private=True
     )
 
 # ==================== CHAT IMAGE UPLOAD ====================
 
 @api_router.post("/chat/upload-image")
 async def upload_chat_image(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     user: dict = Depends(get_current_user)
 ):
@@ -937,20 +2711,12 @@ async def upload_chat_image(
     if file.content_type not in allowed_types:
         raise HTTPException(status_code=400, detail="Only images are allowed (jpg, png, gif, webp)")
     
-    # Generate unique filename
-    file_id = str(uuid.uuid4())
-    file_extension = Path(file.filename).suffix if file.filename else ".jpg"
-    filename = f"{file_id}{file_extension}"
-    file_path = CHAT_UPLOAD_DIR / filename
-    
     # Save file
-    content = await file.read()
-    with open(file_path, "wb") as buffer:
-        buffer.write(content)
+    blob = await store_blob(file, MAX_CHAT_IMAGE_BYTES, file.content_type)
     
     # Create chat message with image
     message_id = str(uuid.uuid4())
-    image_url = f"/api/uploads/chat/{filename}"
+    image_url = blob["url"]
     message_doc = {
         "id": message_id,
         "user_id": user["id"],
@@ -958,12 +2724,71 @@ async def upload_chat_image(
         "role": user["role"],
         "content": "",
         "image_url": image_url,
+        "blob_id": blob["blob_id"],
         "is_ai": False,
         "created_at": datetime.now(timezone.utc).isoformat()
     }
     
-    await db.chat_messages.insert_one(message_doc)
-    return ChatResponse(**message_doc, image_url=image_url)
+    await insert_blob_owner(db.chat_messages, message_doc)
+    publish_chat_event("message", message_doc)
+    background_tasks.add_task(process_chat_image, message_id, blob["path"])
+    return ChatResponse(**message_doc)
+
+# ==================== CHAT IMAGE THUMBNAILS ====================
+
+# Chat images are decoded once in a worker pool and re-encoded as WebP at fixed widths
+# (never upscaled). Nothing but pixels is copied, so EXIF/ICC metadata is dropped.
+THUMBNAIL_WIDTHS = sorted(int(width) for width in os.environ.get('THUMBNAIL_WIDTHS', '320,640').split(','))
+THUMBNAIL_QUALITY = int(os.environ.get('THUMBNAIL_QUALITY', 80))
+THUMBNAIL_POOL_SIZE = int(os.environ.get('THUMBNAIL_POOL_SIZE', 2))
+
+thumbnail_executor = ThreadPoolExecutor(max_workers=THUMBNAIL_POOL_SIZE, thread_name_prefix="thumbnail")
+
+def render_thumbnails(path: Path) -> dict:
+    with Image.open(path) as original:
+        image = ImageOps.exif_transpose(original)
+        width, height = image.size
+        image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+        
+        rendered = {}
+        thumbnails = {}
+        for target in THUMBNAIL_WIDTHS:
+            thumb_width = min(target, width)
+            if thumb_width not in rendered:
+                thumb_height = max(1, round(height * thumb_width / width))
+                resized = image if thumb_width == width else image.resize((thumb_width, thumb_height), Image.LANCZOS)
+                output = io.BytesIO()
+                resized.save(output, "WEBP", quality=THUMBNAIL_QUALITY)
+                rendered[thumb_width] = output.getvalue()
+            thumbnails[target] = rendered[thumb_width]
+    return {"width": width, "height": height, "thumbnails": thumbnails}
+
+async def process_chat_image(message_id: str, path: Path):
+    try:
+        result = await asyncio.get_running_loop().run_in_executor(thumbnail_executor, render_thumbnails, path)
+        thumbnails = {}
+        thumbnail_blob_ids = []
+        for width, data in result["thumbnails"].items():
+            blob = await store_blob_bytes(data, "image/webp")
+            thumbnails[str(width)] = blob["url"]
+            thumbnail_blob_ids.append(blob["blob_id"])
+        
+        updated_message = await db.chat_messages.find_one_and_update(
+            {"id": message_id},
+            {"$set": {
+                "image_width": result["width"],
+                "image_height": result["height"],
+                "thumbnails": thumbnails,
+                "thumbnail_url": thumbnails[str(THUMBNAIL_WIDTHS[-1])],
+                "thumbnail_blob_ids": thumbnail_blob_ids
+            }},
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER
+        )
+        if updated_message:
+            publish_chat_event("update", updated_message)
+    except Exception as e:
+        logger.error(f"Thumbnail error for chat message {message_id}: {str(e)}")
 
 # ==================== REPORT WITH FILE UPLOAD ====================
 
@@ -978,21 +2803,16 @@ async def create_report_with_file(
 ):
     file_url = None
     file_name = None
+    blob_id = None
     
     if file:
-        # Generate unique filename
-        file_id = str(uuid.uuid4())
-        file_extension = Path(file.filename).suffix if file.filename else ""
-        filename = f"{file_id}{file_extension}"
-        file_path = REPORTS_UPLOAD_DIR / filename
-        
         # Save file
-        content = await file.read()
-        with open(file_path, "wb") as buffer:
-            buffer.write(content)
+        content_type = mimetypes.guess_type(file.filename or "")[0] or "application/octet-stream"
+        blob = await store_blob(file, MAX_REPORT_UPLOAD_BYTES, content_type)
         
-        file_url = f"/api/uploads/reports/{filename}"
+        file_url = blob["url"]
         file_name = file.filename
+        blob_id = blob["blob_id"]
     
     report_id = str(uuid.uuid4())
     report_doc = {
@@ -1009,15 +2829,14 @@ async def create_report_with_file(
         "reviewed_at": None,
         "evidence": None,
         "file_url": file_url,
-        "file_name": file_name
+        "file_name": file_name,
+        "blob_id": blob_id,
+        "outbox": [outbox_entry("report_submitted", {"user_id": user["id"], "report_id": report_id})]
     }
     
-    await db.reports.insert_one(report_doc)
-    
-    await db.users.update_one(
-        {"id": user["id"]},
-        {"$inc": {"reports_submitted": 1, "rank_points": 10}}
-    )
+    await insert_blob_owner(db.reports, report_doc)
+    await increment_counters(counter_delta("reports", after=report_doc))
+    await relay_outbox("reports", report_id, report_doc["outbox"])
     
     return ReportResponse(**report_doc)
 
@@ -1029,7 +2848,97 @@ async def get_notifications(user: dict = Depends(get_current_user)):
         {"user_id": user["id"]},
         {"_id": 0}
     ).sort("created_at", -1).limit(20).to_list(20)
-    return notifications
+    return ORJSONResponse(notifications)
+
+# Server-Sent Events: one fan_out queue per open stream, grouped by user. Streams send a
+# heartbeat comment every NOTIFICATIONS_SSE_HEARTBEAT seconds and resume from Last-Event-ID.
+NOTIFICATIONS_SSE_HEARTBEAT = float(os.environ.get('NOTIFICATIONS_SSE_HEARTBEAT', 15))
+NOTIFICATIONS_SSE_QUEUE_SIZE = int(os.environ.get('NOTIFICATIONS_SSE_QUEUE_SIZE', 50))
+NOTIFICATIONS_SSE_RESUME_LIMIT = int(os.environ.get('NOTIFICATIONS_SSE_RESUME_LIMIT', 100))
+NOTIFICATIONS_SSE_RETRY_MS = 3000
+
+notification_subscribers = {}
+notification_sse_stats = {"connections": 0, "published": 0, "dropped_slow": 0}
+
+def _sse_event(event: str, data: dict, event_id: Optional[str] = None) -> str:
+    lines = [f"id: {event_id}"] if event_id else []
+    lines += [f"event: {event}", f"data: {json.dumps(data)}"]
+    return "\n".join(lines) + "\n\n"
+
+def _publish_to_user(user_id: str, payload: str, notification_id: Optional[str] = None):
+    # notification_id lets a resuming stream skip what it already replayed
+    fan_out(notification_subscribers.get(user_id, set()), (notification_id, payload))
+    notification_sse_stats["published"] += 1
+
+async def _unread_event(user_id: str) -> str:
+    unread = await db.notifications.count_documents({"user_id": user_id, "read": False})
+    return _sse_event("unread", {"unread": unread})
+
+async def publish_notifications(user_id: str, notification_docs: List[dict]):
+    if not notification_subscribers.get(user_id):
+        return
+    for notification_doc in notification_docs:
+        payload = {k: v for k, v in notification_doc.items() if k != "_id"}
+        _publish_to_user(user_id, _sse_event("notification", payload, notification_doc["id"]), notification_doc["id"])
+    _publish_to_user(user_id, await _unread_event(user_id))
+
+async def publish_unread_count(user_id: str):
+    if notification_subscribers.get(user_id):
+        _publish_to_user(user_id, await _unread_event(user_id))
+
+async def notification_event_stream(request: Request, user_id: str, last_event_id: Optional[str]):
+    queue = asyncio.Queue(maxsize=NOTIFICATIONS_SSE_QUEUE_SIZE)
+    # Subscribe before the resume query so nothing published in between is lost
+    notification_subscribers.setdefault(user_id, set()).add(queue)
+    notification_sse_stats["connections"] += 1
+    try:
+        yield f"retry: {NOTIFICATIONS_SSE_RETRY_MS}\n\n"
+        sent_ids = set()
+        if last_event_id:
+            anchor = await db.notifications.find_one(
+                {"id": last_event_id, "user_id": user_id},
+                {"_id": 0, "id": 1, "created_at": 1}
+            )
+            if anchor:
+                missed = await db.notifications.find(
+                    {"user_id": user_id, **keyset_query(anchor, "$gt")},
+                    {"_id": 0}
+                ).sort(PAGE_SORT_ASC).limit(NOTIFICATIONS_SSE_RESUME_LIMIT).to_list(NOTIFICATIONS_SSE_RESUME_LIMIT)
+                for notification_doc in missed:
+                    sent_ids.add(notification_doc["id"])
+                    yield _sse_event("notification", notification_doc, notification_doc["id"])
+        yield await _unread_event(user_id)
+        
+        while not await request.is_disconnected():
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout=NOTIFICATIONS_SSE_HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield ": heartbeat\n\n"
+                continue
+            if item is None:
+                notification_sse_stats["dropped_slow"] += 1
+                return
+            notification_id, payload = item
+            if notification_id in sent_ids:
+                continue
+            yield payload
+    finally:
+        subscribers = notification_subscribers.get(user_id)
+        if subscribers is not None:
+            subscribers.discard(queue)
+            if not subscribers:
+                notification_subscribers.pop(user_id, None)
+        notification_sse_stats["connections"] -= 1
+
+@api_router.get("/notifications/stream")
+async def stream_notifications(request: Request, ticket: str, last_event_id: Optional[str] = None):
+    # EventSource cannot send an Authorization header, so a stream ticket comes in the query string
+    user = await authenticate_token(ticket, purpose="stream")
+    return StreamingResponse(
+        notification_event_stream(request, user["id"], request.headers.get("last-event-id") or last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @api_router.post("/notifications/mark-read/{notification_id}")
 async def mark_notification_read(notification_id: str, user: dict = Depends(get_current_user)):
@@ -1037,6 +2946,7 @@ async def mark_notification_read(notification_id: str, user: dict = Depends(get_
         {"id": notification_id, "user_id": user["id"]},
         {"$set": {"read": True}}
     )
+    await publish_unread_count(user["id"])
     return {"message": "Notification marked as read"}
 
 @api_router.post("/notifications/mark-all-read")
@@ -1045,10 +2955,11 @@ async def mark_all_notifications_read(user: dict = Depends(get_current_user)):
         {"user_id": user["id"]},
         {"$set": {"read": True}}
     )
+    await publish_unread_count(user["id"])
     return {"message": "All notifications marked as read"}
 
-async def create_notification(user_id: str, title: str, message: str, notification_type: str = "info"):
-    notification_doc = {
+def build_notification(user_id: str, title: str, message: str, notification_type: str = "info") -> dict:
+    return {
         "id": str(uuid.uuid4()),
         "user_id": user_id,
         "title": title,
@@ -1057,64 +2968,312 @@ async def create_notification(user_id: str, title: str, message: str, notificati
         "read": False,
         "created_at": datetime.now(timezone.utc).isoformat()
     }
-    await db.notifications.insert_one(notification_doc)
+
+async def create_notification(
+    user_id: str,
+    title: str,
+    message: str,
+    notification_type: str = "info",
+    notification_id: Optional[str] = None
+):
+    doc = build_notification(user_id, title, message, notification_type)
+    if notification_id is None:
+        await db.notifications.insert_one(doc)
+    else:
+        # Callers that may run more than once pass a stable id; only the first call inserts and publishes
+        doc["id"] = notification_id
+        try:
+            result = await db.notifications.update_one({"id": notification_id}, {"$setOnInsert": doc}, upsert=True)
+        except DuplicateKeyError:
+            # A concurrent upsert of the same id won the unique index
+            return
+        if result.upserted_id is None:
+            return
+    await publish_notifications(user_id, [doc])
 
 async def check_and_award_badges(user_id: str):
-    user = await db.users.find_one({"id": user_id}, {"_id": 0})
-    if not user:
-        return
-    
-    earned_badges = []
-    
-    for badge in BADGES:
-        already_has = await db.user_badges.find_one({"user_id": user_id, "badge_id": badge["id"]})
-        if already_has:
-            continue
-            
-        earned = False
-        if badge["requirement_type"] == "missions" and user.get("missions_completed", 0) >= badge["requirement_value"]:
-            earned = True
-        elif badge["requirement_type"] == "reports" and user.get("reports_submitted", 0) >= badge["requirement_value"]:
-            earned = True
-        elif badge["requirement_type"] == "points" and user.get("rank_points", 0) >= badge["requirement_value"]:
-            earned = True
-        
-        if earned:
-            await db.user_badges.insert_one({
-                "id": str(uuid.uuid4()),
-                "user_id": user_id,
-                "badge_id": badge["id"],
-                "earned_at": datetime.now(timezone.utc).isoformat()
-            })
-            earned_badges.append(badge)
-            await create_notification(
+    user = await db.users.find_one({"id": user_id}, BADGE_USER_PROJECTION)
+    if user is None:
+        return []
+    qualified = evaluate_badges(user)
+    if not qualified:
+        return []
+
+    owned = {
+        doc["badge_id"]
+        async for doc in db.user_badges.find({"user_id": user_id}, {"_id": 0, "badge_id": 1})
+    }
+    candidates = [badge for badge in qualified if badge["id"] not in owned]
+    if not candidates:
+        return []
+
+    now = datetime.now(timezone.utc).isoformat()
+    try:
+        await db.user_badges.insert_many(
+            [
+                {"id": str(uuid.uuid4()), "user_id": user_id, "badge_id": badge["id"], "earned_at": now}
+                for badge in candidates
+            ],
+            ordered=False,
+        )
+        earned_badges = candidates
+    except BulkWriteError as e:
+        # A concurrent evaluation already awarded some of these; the unique
+        # (user_id, badge_id) index rejected our copies, so skip their notifications.
+        write_errors = e.details.get("writeErrors", [])
+        if any(err.get("code") != 11000 for err in write_errors):
+            raise
+        duplicates = {err["index"] for err in write_errors}
+        earned_badges = [badge for i, badge in enumerate(candidates) if i not in duplicates]
+
+    if earned_badges:
+        notifications = [
+            build_notification(
                 user_id,
                 "🏆 Nova Conquista!",
                 f"Você desbloqueou o badge '{badge['name']}': {badge['description']}",
                 "badge"
             )
-    
+            for badge in earned_badges
+        ]
+        await db.notifications.insert_many(notifications)
+        await publish_notifications(user_id, notifications)
     return earned_badges
 
+# ==================== JOB QUEUE ====================
+
+# Side effects of a committed state change (points, badges, notifications) run from db.jobs
+# so the request does not wait on them. A worker leases a job for JOB_LEASE seconds; if it
+# dies the lease expires and another worker picks the job up again. Delivery is therefore
+# at-least-once and every handler must be safe to repeat.
+#
+# A job is first written as an outbox entry in the same update as the state change that
+# causes it, so the two cannot diverge. The request relays it to db.jobs straight away; if
+# that fails, background_outbox_drain picks it up. The job keeps the entry's id, so relaying
+# an entry twice still yields a single job.
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 4))
+JOB_LEASE = float(os.environ.get('JOB_LEASE', 60))
+JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 5))
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 5))
+JOB_RETRY_BACKOFF = float(os.environ.get('JOB_RETRY_BACKOFF', 10))
+JOB_RETENTION = float(os.environ.get('JOB_RETENTION', 7 * 24 * 3600))
+OUTBOX_DRAIN_INTERVAL = float(os.environ.get('OUTBOX_DRAIN_INTERVAL', 30))
+OUTBOX_COLLECTIONS = ("missions", "reports")
+# Recent job ids remembered on each user so redelivered point awards are skipped
+APPLIED_JOBS_KEEP = 50
+
+job_stats = {"enqueued": 0, "completed": 0, "retried": 0, "failed": 0, "running": 0}
+job_wakeup = asyncio.Event()
+job_worker_tasks: List[asyncio.Task] = []
+
+async def enqueue_job(job_type: str, payload: dict, job_id: Optional[str] = None) -> str:
+    now = datetime.now(timezone.utc).isoformat()
+    job_id = job_id or str(uuid.uuid4())
+    try:
+        await db.jobs.insert_one({
+            "id": job_id,
+            "type": job_type,
+            "payload": payload,
+            "status": "pending",
+            "attempts": 0,
+            "run_at": now,
+            "locked_until": None,
+            "last_error": None,
+            "created_at": now,
+            "finished_at": None
+        })
+    except DuplicateKeyError:
+        # Already relayed from the outbox
+        return job_id
+    job_stats["enqueued"] += 1
+    job_wakeup.set()
+    return job_id
+
+def outbox_entry(job_type: str, payload: dict) -> dict:
+    return {"id": str(uuid.uuid4()), "type": job_type, "payload": payload}
+
+async def relay_outbox(collection: str, doc_id: str, entries: List[dict]):
+    try:
+        for entry in entries:
+            await enqueue_job(entry["type"], entry["payload"], job_id=entry["id"])
+        await db[collection].update_one(
+            {"id": doc_id},
+            {"$pull": {"outbox": {"id": {"$in": [entry["id"] for entry in entries]}}}}
+        )
+    except PyMongoError as e:
+        # The state change is already committed; the drain relays the entries later
+        logger.warning(f"Outbox relay for {collection} {doc_id} deferred: {str(e)}")
+
+async def drain_outbox():
+    for collection in OUTBOX_COLLECTIONS:
+        async for doc in db[collection].find({"outbox.id": {"$exists": True}}, {"_id": 0, "id": 1, "outbox": 1}):
+            await relay_outbox(collection, doc["id"], doc["outbox"])
+
+async def background_outbox_drain():
+    while True:
+        await asyncio.sleep(OUTBOX_DRAIN_INTERVAL)
+        try:
+            await drain_outbox()
+        except Exception as e:
+            logger.error(f"Outbox drain error: {str(e)}")
+
+async def claim_job() -> Optional[dict]:
+    now = datetime.now(timezone.utc)
+    return await db.jobs.find_one_and_update(
+        {"$or": [
+            {"status": "pending", "run_at": {"$lte": now.isoformat()}},
+            {"status": "running", "locked_until": {"$lte": now.isoformat()}}
+        ]},
+        {
+            "$set": {"status": "running", "locked_until": (now + timedelta(seconds=JOB_LEASE)).isoformat()},
+            "$inc": {"attempts": 1}
+        },
+        sort=[("run_at", ASCENDING)],
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+
+async def apply_points(job_id: str, user_id: str, increments: dict):
+    # The job id is pushed in the same update as the $inc, so a redelivered job matches nothing
+    result = await db.users.update_one(
+        {"id": user_id, "applied_jobs": {"$ne": job_id}},
+        {
+            "$inc": increments,
+            "$push": {"applied_jobs": {"$each": [job_id], "$slice": -APPLIED_JOBS_KEEP}}
+        }
+    )
+    invalidate_user_cache(user_id)
+    if result.modified_count:
+        leaderboard.add(user_id, increments.get("rank_points", 0))
+
+async def handle_mission_completed(job: dict):
+    payload = job["payload"]
+    await apply_points(job["id"], payload["user_id"], {"missions_completed": 1, "rank_points": 100})
+    await check_and_award_badges(payload["user_id"])
+    await create_notification(
+        payload["user_id"],
+        "🎯 Missão Concluída!",
+        f"Parabéns! Você completou a missão '{payload['mission_title']}' e ganhou +100 pontos!",
+        "mission",
+        notification_id=job["id"]
+    )
+
+async def handle_report_submitted(job: dict):
+    payload = job["payload"]
+    await apply_points(job["id"], payload["user_id"], {"reports_submitted": 1, "rank_points": 10})
+    await check_and_award_badges(payload["user_id"])
+
+JOB_HANDLERS = {
+    "mission_completed": handle_mission_completed,
+    "report_submitted": handle_report_submitted,
+}
+
+async def run_job(job: dict):
+    now = datetime.now(timezone.utc)
+    try:
+        handler = JOB_HANDLERS.get(job["type"])
+        if handler is None:
+            raise ValueError(f"Unknown job type: {job['type']}")
+        await handler(job)
+    except Exception as e:
+        if job["attempts"] >= JOB_MAX_ATTEMPTS:
+            # Failed jobs are kept (no expire_at) so they can be inspected and requeued
+            update = {"status": "failed", "locked_until": None, "last_error": str(e), "finished_at": now.isoformat()}
+            job_stats["failed"] += 1
+            logger.error(f"Job {job['id']} ({job['type']}) failed after {job['attempts']} attempts: {str(e)}")
+        else:
+            retry_at = now + timedelta(seconds=JOB_RETRY_BACKOFF * 2 ** (job["attempts"] - 1))
+            update = {"status": "pending", "locked_until": None, "last_error": str(e), "run_at": retry_at.isoformat()}
+            job_stats["retried"] += 1
+            logger.warning(f"Job {job['id']} ({job['type']}) attempt {job['attempts']} failed: {str(e)}")
+    else:
+        update = {
+            "status": "done",
+            "locked_until": None,
+            "finished_at": now.isoformat(),
+            "expire_at": now + timedelta(seconds=JOB_RETENTION)
+        }
+        job_stats["completed"] += 1
+    # Matching on the lease means a worker whose lease already expired cannot clobber the new owner
+    await db.jobs.update_one({"id": job["id"], "locked_until": job["locked_until"]}, {"$set": update})
+
+async def job_worker():
+    while True:
+        # Cleared before claiming so an enqueue racing with an empty claim still wakes us
+        job_wakeup.clear()
+        try:
+            job = await claim_job()
+        except Exception as e:
+            logger.error(f"Job claim error: {str(e)}")
+            job = None
+        if job is None:
+            try:
+                await asyncio.wait_for(job_wakeup.wait(), timeout=JOB_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        job_stats["running"] += 1
+        try:
+            await run_job(job)
+        except Exception as e:
+            logger.error(f"Job {job['id']} bookkeeping error: {str(e)}")
+        finally:
+            job_stats["running"] -= 1
+
+@api_router.get("/stats/jobs")
+async def get_job_stats(user: dict = Depends(require_roles([UserRole.ADMIN]))):
+    by_status = await db.jobs.aggregate([{"$group": {"_id": "$status", "n": {"$sum": 1}}}]).to_list(None)
+    return {
+        **job_stats,
+        "workers": JOB_WORKERS,
+        "jobs": {item["_id"]: item["n"] for item in by_status}
+    }
+
 # ==================== SERVE UPLOADED FILES ====================
 
 @api_router.get("/uploads/chat/{filename}")
-async def serve_chat_file(filename: str):
+async def serve_chat_file(filename: str, request: Request):
     file_path = CHAT_UPLOAD_DIR / filename
     if not file_path.exists():
         raise HTTPException(status_code=404, detail="File not found")
-    return FileResponse(path=file_path)
+    return file_response(request, file_path)
 
 @api_router.get("/uploads/reports/{filename}")
-async def serve_report_file(filename: str):
+async def serve_report_file(filename: str, request: Request):
     file_path = REPORTS_UPLOAD_DIR / filename
     if not file_path.exists():
         raise HTTPException(status_code=404, detail="File not found")
-    return FileResponse(path=file_path)
+    return file_response(request, file_path)
+
+async def can_read_blob(blob_id: str, user: dict) -> bool:
+    # Chat images and report attachments only; tool files go through /tools/download
+    if await db.chat_messages.find_one(
+        {"$or": [{"blob_id": blob_id}, {"thumbnail_blob_ids": blob_id}]}, {"_id": 1}
+    ):
+        return True
+    report_query = {"blob_id": blob_id}
+    if user["role"] == UserRole.EXTERNO:
+        report_query["submitted_by"] = user["id"]
+    return await db.reports.find_one(report_query, {"_id": 1}) is not None
+
+@api_router.get("/uploads/blobs/{blob_id}")
+async def serve_blob(blob_id: str, request: Request, user: dict = Depends(get_current_user)):
+    # Knowing a hash is not access: unreadable and missing blobs both answer 404
+    if not BLOB_ID_PATTERN.match(blob_id) or not await can_read_blob(blob_id, user):
+        raise HTTPException(status_code=404, detail="File not found")
+    blob = await db.blobs.find_one({"_id": blob_id}, {"content_type": 1})
+    file_path = blob_path(blob_id)
+    if not blob or not file_path.exists():
+        raise HTTPException(status_code=404, detail="File not found")
+    return file_response(
+        request, file_path, content_hash=blob_id, media_type=blob.get("content_type"), private=True
+    )
 
 # Include router
 app.include_router(api_router)
 
+app.add_middleware(RequestBodyLimitMiddleware)
+
 # CORS Middleware
 app.add_middleware(
     CORSMiddleware,
@@ -1122,6 +3281,7 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 # Logging
@@ -1134,7 +3294,43 @@ logger = logging.getLogger(__name__)
 # Background task for site checking
 @app.on_event("startup")
 async def startup_event():
+    # Migrations go first so they can replace indexes whose options ensure_indexes would conflict with
+    await run_migrations()
+    await ensure_indexes()
+    try:
+        for entry in await explain_hot_queries():
+            if not entry["indexed"]:
+                logger.warning(f"Unindexed query {entry['query']}: {' -> '.join(entry['stages'])}")
+    except PyMongoError as e:
+        logger.error(f"Failed to explain hot queries: {str(e)}")
+    try:
+        await resync_leaderboard()
+    except PyMongoError as e:
+        logger.error(f"Failed to load leaderboard: {str(e)}")
+    get_site_check_client()
     asyncio.create_task(background_site_check())
+    asyncio.create_task(background_counter_reconcile())
+    asyncio.create_task(background_blob_gc())
+    asyncio.create_task(background_leaderboard_resync())
+    asyncio.create_task(background_outbox_drain())
+    job_worker_tasks.extend(asyncio.create_task(job_worker()) for _ in range(JOB_WORKERS))
+
+@app.on_event("shutdown")
+async def shutdown_site_check_client():
+    await close_site_check_client()
+
+@app.on_event("shutdown")
+async def shutdown_job_workers():
+    # In-flight jobs are not acknowledged; their leases expire and they are redelivered
+    for task in job_worker_tasks:
+        task.cancel()
+    await asyncio.gather(*job_worker_tasks, return_exceptions=True)
+    job_worker_tasks.clear()
+
+@app.on_event("shutdown")
+async def shutdown_executors():
+    bcrypt_executor.shutdown(wait=False)
+    thumbnail_executor.shutdown(wait=False)
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
@@ -122,13 +122,52 @@ export default function Layout() {
     fetchNotifications();
     refreshUserData();
 
-    // Refresh every 10 seconds
-    const interval = setInterval(() => {
-      fetchNotifications();
-      refreshUserData();
-    }, 10000);
+    // New notifications and the unread count are pushed over SSE. The stream ticket in the
+    // URL expires quickly, so instead of letting EventSource retry with it we reconnect with
+    // a fresh ticket and resume from the last event id ourselves.
+    let source = null;
+    let retryTimer = null;
+    let closed = false;
+    let lastEventId = null;
 
-    return () => clearInterval(interval);
+    const connect = async () => {
+      let url;
+      try {
+        url = await api.notificationsStreamUrl(lastEventId);
+      } catch (error) {
+        console.error("Error getting notification stream ticket:", error);
+        if (!closed) {
+          retryTimer = setTimeout(connect, 3000);
+        }
+        return;
+      }
+      if (closed) return;
+      source = new EventSource(url);
+      source.addEventListener("notification", (event) => {
+        lastEventId = event.lastEventId || lastEventId;
+        const notification = JSON.parse(event.data);
+        setNotifications(prev =>
+          prev.some(n => n.id === notification.id) ? prev : [notification, ...prev].slice(0, 20)
+        );
+        refreshUserData();
+      });
+      source.addEventListener("unread", (event) => {
+        setUnreadCount(JSON.parse(event.data).unread);
+      });
+      source.onerror = () => {
+        source.close();
+        if (!closed) {
+          retryTimer = setTimeout(connect, 3000);
+        }
+      };
+    };
+
+    connect();
+    return () => {
+      closed = true;
+      clearTimeout(retryTimer);
+      if (source) source.close();
+    };
   }, [updateUserData]);
 
   // Show toast for new badge notifications
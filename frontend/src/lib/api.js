@@ -7,6 +7,24 @@ const getAuthHeaders = () => {
   return token ? { Authorization: `Bearer ${token}` } : {};
 };
 
+// List endpoints return one page and put the cursor for the next one in this header
+export const nextCursor = (response) => response.headers["x-next-cursor"] || null;
+
+// Follows X-Next-Cursor to the last page, for views that need the whole collection
+const getAllPages = async (path, params = {}) => {
+  const data = [];
+  let cursor = null;
+  do {
+    const response = await axios.get(`${API}${path}`, {
+      headers: getAuthHeaders(),
+      params: cursor ? { ...params, cursor } : params,
+    });
+    data.push(...response.data);
+    cursor = nextCursor(response);
+  } while (cursor);
+  return { data };
+};
+
 export const api = {
   // Auth
   login: (email, password) =>
@@ -16,10 +34,11 @@ export const api = {
     axios.get(`${API}/auth/me`, { headers: getAuthHeaders() }),
 
   // Users
-  getUsers: () =>
-    axios.get(`${API}/users`, { headers: getAuthHeaders() }),
+  getUsers: () => getAllPages("/users"),
   getRanking: () =>
     axios.get(`${API}/users/ranking`, { headers: getAuthHeaders() }),
+  getMyRank: () =>
+    axios.get(`${API}/users/ranking/me`, { headers: getAuthHeaders() }),
   updateUser: (userId, data) =>
     axios.put(`${API}/users/${userId}`, data, { headers: getAuthHeaders() }),
   deleteUser: (userId) =>
@@ -42,6 +61,8 @@ export const api = {
   // Reports
   getReports: (params = {}) =>
     axios.get(`${API}/reports`, { headers: getAuthHeaders(), params }),
+  getReport: (reportId) =>
+    axios.get(`${API}/reports/${reportId}`, { headers: getAuthHeaders() }),
   createReport: (data) =>
     axios.post(`${API}/reports`, data, { headers: getAuthHeaders() }),
   acceptReport: (reportId) =>
@@ -50,8 +71,7 @@ export const api = {
     axios.post(`${API}/reports/${reportId}/reject`, {}, { headers: getAuthHeaders() }),
 
   // Tools
-  getTools: (params = {}) =>
-    axios.get(`${API}/tools`, { headers: getAuthHeaders(), params }),
+  getTools: (params = {}) => getAllPages("/tools", params),
   createTool: (data) =>
     axios.post(`${API}/tools`, data, { headers: getAuthHeaders() }),
   uploadTool: (formData) =>
@@ -63,6 +83,15 @@ export const api = {
       headers: getAuthHeaders(), 
       responseType: 'blob' 
     }),
+  // Uploaded files need the auth header, so they are fetched and exposed as object URLs.
+  // Callers revoke the URL with URL.revokeObjectURL when done.
+  fetchFileUrl: async (path) => {
+    const response = await axios.get(`${process.env.REACT_APP_BACKEND_URL}${path}`, {
+      headers: getAuthHeaders(),
+      responseType: "blob",
+    });
+    return URL.createObjectURL(response.data);
+  },
   deleteTool: (toolId) =>
     axios.delete(`${API}/tools/${toolId}`, { headers: getAuthHeaders() }),
 
@@ -72,13 +101,56 @@ export const api = {
   getUserBadges: (userId) =>
     axios.get(`${API}/badges/user/${userId}`, { headers: getAuthHeaders() }),
 
+  // WebSocket and EventSource cannot send headers; they authenticate with a short-lived
+  // ticket in the URL instead of the session token
+  getStreamTicket: async () => {
+    const response = await axios.post(`${API}/auth/stream-ticket`, {}, { headers: getAuthHeaders() });
+    return response.data.ticket;
+  },
+
   // Chat
   getChatMessages: (limit = 50) =>
     axios.get(`${API}/chat/messages`, { headers: getAuthHeaders(), params: { limit } }),
+  chatSocketUrl: async (lastId) => {
+    const params = new URLSearchParams({ ticket: await api.getStreamTicket() });
+    if (lastId) params.set("last_id", lastId);
+    return `${API.replace(/^http/, "ws")}/chat/ws?${params.toString()}`;
+  },
   sendMessage: (content) =>
     axios.post(`${API}/chat/send`, { content }, { headers: getAuthHeaders() }),
   sendAiMessage: (content) =>
     axios.post(`${API}/chat/ai`, { content }, { headers: getAuthHeaders() }),
+  // Streams the AI reply as Server-Sent Events; onEvent receives (event, data) per frame.
+  // Aborting the signal closes the request and cancels the upstream model call.
+  streamAiMessage: async (content, onEvent, signal) => {
+    const response = await fetch(`${API}/chat/ai/stream`, {
+      method: "POST",
+      headers: { ...getAuthHeaders(), "Content-Type": "application/json" },
+      body: JSON.stringify({ content }),
+      signal,
+    });
+    if (!response.ok) throw new Error(`AI stream failed: ${response.status}`);
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    for (;;) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      let boundary;
+      while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+        const frame = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+        let event = "message";
+        let data = "";
+        for (const line of frame.split("\n")) {
+          if (line.startsWith("event: ")) event = line.slice(7);
+          else if (line.startsWith("data: ")) data += line.slice(6);
+        }
+        if (data) onEvent(event, JSON.parse(data));
+      }
+    }
+  },
   uploadChatImage: (formData) =>
     axios.post(`${API}/chat/upload-image`, formData, {
       headers: { ...getAuthHeaders(), "Content-Type": "multipart/form-data" },
@@ -111,6 +183,11 @@ export const api = {
   // Notifications
   getNotifications: () =>
     axios.get(`${API}/notifications`, { headers: getAuthHeaders() }),
+  notificationsStreamUrl: async (lastEventId) => {
+    const params = new URLSearchParams({ ticket: await api.getStreamTicket() });
+    if (lastEventId) params.set("last_event_id", lastEventId);
+    return `${API}/notifications/stream?${params.toString()}`;
+  },
   markNotificationRead: (notificationId) =>
     axios.post(`${API}/notifications/mark-read/${notificationId}`, {}, { headers: getAuthHeaders() }),
   markAllNotificationsRead: () =>
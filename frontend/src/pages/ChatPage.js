@@ -34,7 +34,6 @@ const ChatMessage = ({ message, isOwn }) => {
   const isAi = message.is_ai;
   const role = roleConfig[message.role] || roleConfig.externo;
   const RoleIcon = role.icon;
-  const API_BASE = process.env.REACT_APP_BACKEND_URL;
 
   return (
     <div
@@ -84,11 +83,9 @@ const ChatMessage = ({ message, isOwn }) => {
           }`}
         >
           {message.image_url && (
-            <img 
-              src={`${API_BASE}${message.image_url}`}
-              alt="Imagem enviada"
-              className="max-w-full max-h-64 mb-2 border border-white/10 cursor-pointer hover:opacity-80 transition-opacity"
-              onClick={() => window.open(`${API_BASE}${message.image_url}`, '_blank')}
+            <AuthImage
+              path={message.thumbnail_url || message.image_url}
+              fullPath={message.image_url}
             />
           )}
           {message.content && (
@@ -102,6 +99,47 @@ const ChatMessage = ({ message, isOwn }) => {
   );
 };
 
+// Chat images are served only to logged-in users, so <img src> cannot point at them directly
+const AuthImage = ({ path, fullPath }) => {
+  const [src, setSrc] = useState(null);
+
+  useEffect(() => {
+    let objectUrl = null;
+    let cancelled = false;
+    api
+      .fetchFileUrl(path)
+      .then((url) => {
+        if (cancelled) URL.revokeObjectURL(url);
+        else setSrc((objectUrl = url));
+      })
+      .catch(() => {});
+    return () => {
+      cancelled = true;
+      if (objectUrl) URL.revokeObjectURL(objectUrl);
+    };
+  }, [path]);
+
+  const openFull = async () => {
+    try {
+      window.open(await api.fetchFileUrl(fullPath), "_blank");
+    } catch (error) {
+      toast.error("Erro ao abrir imagem");
+    }
+  };
+
+  if (!src) {
+    return <div className="w-48 h-32 mb-2 border border-white/10 bg-white/5 animate-pulse" />;
+  }
+  return (
+    <img
+      src={src}
+      alt="Imagem enviada"
+      className="max-w-full max-h-64 mb-2 border border-white/10 cursor-pointer hover:opacity-80 transition-opacity"
+      onClick={openFull}
+    />
+  );
+};
+
 export default function ChatPage() {
   const { user, token } = useAuth();
   const [messages, setMessages] = useState([]);
@@ -109,6 +147,8 @@ export default function ChatPage() {
   const [loading, setLoading] = useState(true);
   const [sending, setSending] = useState(false);
   const [aiLoading, setAiLoading] = useState(false);
+  const [aiDraft, setAiDraft] = useState("");
+  const aiAbortRef = useRef(null);
   const [selectedImage, setSelectedImage] = useState(null);
   const [imagePreview, setImagePreview] = useState(null);
   const scrollRef = useRef(null);
@@ -125,10 +165,59 @@ export default function ChatPage() {
     }
   };
 
+  const lastMessageIdRef = useRef(null);
+
+  useEffect(() => {
+    if (messages.length > 0) {
+      lastMessageIdRef.current = messages[messages.length - 1].id;
+    }
+  }, [messages]);
+
   useEffect(() => {
-    fetchMessages();
-    const interval = setInterval(fetchMessages, 3000);
-    return () => clearInterval(interval);
+    let socket = null;
+    let reconnectTimer = null;
+    let closed = false;
+
+    // New messages are pushed over the WebSocket; on reconnect the server replays what was missed.
+    // Each attempt fetches a fresh stream ticket, since tickets expire after a minute.
+    const connect = async () => {
+      let url;
+      try {
+        url = await api.chatSocketUrl(lastMessageIdRef.current);
+      } catch (error) {
+        console.error("Error getting chat stream ticket:", error);
+        if (!closed) {
+          reconnectTimer = setTimeout(connect, 2000);
+        }
+        return;
+      }
+      if (closed) return;
+      socket = new WebSocket(url);
+      socket.onmessage = (event) => {
+        const { type, data } = JSON.parse(event.data);
+        setMessages((current) => {
+          const index = current.findIndex((m) => m.id === data.id);
+          if (index === -1) {
+            return type === "message" ? [...current, data] : current;
+          }
+          const updated = [...current];
+          updated[index] = data;
+          return updated;
+        });
+      };
+      socket.onclose = () => {
+        if (!closed) {
+          reconnectTimer = setTimeout(connect, 2000);
+        }
+      };
+    };
+
+    fetchMessages().then(connect);
+    return () => {
+      closed = true;
+      clearTimeout(reconnectTimer);
+      if (socket) socket.close();
+    };
   }, []);
 
   useEffect(() => {
@@ -193,17 +282,37 @@ export default function ChatPage() {
     const question = newMessage;
     setNewMessage("");
 
+    const controller = new AbortController();
+    aiAbortRef.current = controller;
+    setAiDraft("");
+
     try {
-      await api.sendAiMessage(question);
+      let failed = false;
+      await api.streamAiMessage(
+        question,
+        (event, data) => {
+          if (event === "token") setAiDraft((draft) => draft + data.text);
+          else if (event === "error") failed = true;
+        },
+        controller.signal
+      );
+      if (failed) throw new Error("AI stream error");
       await fetchMessages();
     } catch (error) {
-      toast.error("Erro ao obter resposta da IA");
-      setNewMessage(question);
+      if (!controller.signal.aborted) {
+        toast.error("Erro ao obter resposta da IA");
+        setNewMessage(question);
+      }
     } finally {
+      aiAbortRef.current = null;
+      setAiDraft("");
       setAiLoading(false);
     }
   };
 
+  // Leaving the page aborts an in-flight answer so the server stops generating it
+  useEffect(() => () => aiAbortRef.current?.abort(), []);
+
   if (loading) {
     return (
       <div className="flex items-center justify-center h-64">
@@ -274,9 +383,13 @@ export default function ChatPage() {
                     </Badge>
                   </div>
                   <div className="p-4 bg-secondary/10 border border-secondary/30">
-                    <p className="text-sm text-secondary animate-pulse">
-                      Processando resposta...
-                    </p>
+                    {aiDraft ? (
+                      <p className="text-sm text-white whitespace-pre-wrap">{aiDraft}</p>
+                    ) : (
+                      <p className="text-sm text-secondary animate-pulse">
+                        Processando resposta...
+                      </p>
+                    )}
                   </div>
                 </div>
               </div>
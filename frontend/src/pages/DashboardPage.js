@@ -115,17 +115,20 @@ export default function DashboardPage() {
   const navigate = useNavigate();
   const [stats, setStats] = useState(null);
   const [ranking, setRanking] = useState([]);
+  const [myRank, setMyRank] = useState(null);
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
     const fetchData = async () => {
       try {
-        const [statsRes, rankingRes] = await Promise.all([
+        const [statsRes, rankingRes, myRankRes] = await Promise.all([
           api.getStats(),
           api.getRanking(),
+          api.getMyRank(),
         ]);
         setStats(statsRes.data);
         setRanking(rankingRes.data);
+        setMyRank(myRankRes.data);
       } catch (error) {
         console.error("Error fetching dashboard data:", error);
       } finally {
@@ -313,6 +316,11 @@ export default function DashboardPage() {
                 Nenhum membro no ranking ainda
               </div>
             )}
+            {myRank?.position > 10 && (
+              <div className="p-4 border-t border-white/10 text-sm text-muted-foreground font-mono">
+                Sua posição: #{myRank.rank} de {myRank.total} ({myRank.rank_points} pts)
+              </div>
+            )}
           </CardContent>
         </Card>
       </div>
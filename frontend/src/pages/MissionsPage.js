@@ -1,6 +1,6 @@
 import { useState, useEffect } from "react";
 import { useAuth } from "../context/AuthContext";
-import { api } from "../lib/api";
+import { api, nextCursor } from "../lib/api";
 import { toast } from "sonner";
 import {
   Target,
@@ -184,6 +184,8 @@ const MissionCard = ({ mission, onAccept, onComplete, currentUser }) => {
 export default function MissionsPage() {
   const { user, isAdmin } = useAuth();
   const [missions, setMissions] = useState([]);
+  const [cursor, setCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [loading, setLoading] = useState(true);
   const [dialogOpen, setDialogOpen] = useState(false);
   const [statusFilter, setStatusFilter] = useState("all");
@@ -199,13 +201,18 @@ export default function MissionsPage() {
 
   const canCreateMission = ["admin", "tenente", "elite"].includes(user?.role);
 
+  const missionParams = () => {
+    const params = {};
+    if (statusFilter && statusFilter !== "all") params.status = statusFilter;
+    if (categoryFilter && categoryFilter !== "all") params.category = categoryFilter;
+    return params;
+  };
+
   const fetchMissions = async () => {
     try {
-      const params = {};
-      if (statusFilter && statusFilter !== "all") params.status = statusFilter;
-      if (categoryFilter && categoryFilter !== "all") params.category = categoryFilter;
-      const response = await api.getMissions(params);
+      const response = await api.getMissions(missionParams());
       setMissions(response.data);
+      setCursor(nextCursor(response));
     } catch (error) {
       console.error("Error fetching missions:", error);
     } finally {
@@ -213,6 +220,19 @@ export default function MissionsPage() {
     }
   };
 
+  const loadMoreMissions = async () => {
+    setLoadingMore(true);
+    try {
+      const response = await api.getMissions({ ...missionParams(), cursor });
+      setMissions((current) => [...current, ...response.data]);
+      setCursor(nextCursor(response));
+    } catch (error) {
+      toast.error("Erro ao carregar mais missões");
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
     fetchMissions();
   }, [statusFilter, categoryFilter]);
@@ -470,6 +490,18 @@ export default function MissionsPage() {
           </CardContent>
         </Card>
       )}
+      {cursor && (
+        <div className="flex justify-center mt-4">
+          <Button
+            variant="outline"
+            className="border-white/20"
+            onClick={loadMoreMissions}
+            disabled={loadingMore}
+          >
+            {loadingMore ? "CARREGANDO..." : "CARREGAR MAIS"}
+          </Button>
+        </div>
+      )}
     </div>
   );
 }
@@ -1,6 +1,6 @@
 import { useState, useEffect, useRef } from "react";
 import { useAuth } from "../context/AuthContext";
-import { api } from "../lib/api";
+import { api, nextCursor } from "../lib/api";
 import { toast } from "sonner";
 import {
   AlertTriangle,
@@ -55,9 +55,22 @@ const statusConfig = {
   rejected: { label: "REJEITADA", color: "bg-destructive/20 text-destructive border-destructive" },
 };
 
+const downloadAttachment = async (report) => {
+  try {
+    const url = await api.fetchFileUrl(report.file_url);
+    const a = document.createElement("a");
+    a.href = url;
+    a.download = report.file_name || "download";
+    document.body.appendChild(a);
+    a.click();
+    window.URL.revokeObjectURL(url);
+    document.body.removeChild(a);
+  } catch (error) {
+    toast.error("Erro ao baixar arquivo");
+  }
+};
+
 const ReportCard = ({ report, onAccept, onReject, canReview }) => {
-  const API_BASE = process.env.REACT_APP_BACKEND_URL;
-  
   return (
     <Card className="hud-panel border-white/10 hover:border-primary/30 transition-all animate-fade-in">
       <CardContent className="p-6">
@@ -129,14 +142,14 @@ const ReportCard = ({ report, onAccept, onReject, canReview }) => {
                 </p>
                 <div className="flex items-center gap-2">
                   <span className="text-white">{report.file_name}</span>
-                  <a
-                    href={`${API_BASE}${report.file_url}`}
-                    download={report.file_name}
+                  <button
+                    type="button"
+                    onClick={() => downloadAttachment(report)}
                     className="text-accent hover:underline flex items-center gap-1"
                   >
                     <Download className="w-3 h-3" />
                     Baixar
-                  </a>
+                  </button>
                 </div>
               </div>
             )}
@@ -175,6 +188,8 @@ const ReportCard = ({ report, onAccept, onReject, canReview }) => {
 export default function ReportsPage() {
   const { user } = useAuth();
   const [reports, setReports] = useState([]);
+  const [cursor, setCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [loading, setLoading] = useState(true);
   const [dialogOpen, setDialogOpen] = useState(false);
   const [statusFilter, setStatusFilter] = useState("all");
@@ -193,12 +208,14 @@ export default function ReportsPage() {
   const selectedCategory = categories.find(c => c.value === formData.category);
   const requiresFile = selectedCategory?.requiresFile || false;
 
+  const reportParams = () =>
+    statusFilter && statusFilter !== "all" ? { status: statusFilter } : {};
+
   const fetchReports = async () => {
     try {
-      const params = {};
-      if (statusFilter && statusFilter !== "all") params.status = statusFilter;
-      const response = await api.getReports(params);
+      const response = await api.getReports(reportParams());
       setReports(response.data);
+      setCursor(nextCursor(response));
     } catch (error) {
       console.error("Error fetching reports:", error);
     } finally {
@@ -206,6 +223,19 @@ export default function ReportsPage() {
     }
   };
 
+  const loadMoreReports = async () => {
+    setLoadingMore(true);
+    try {
+      const response = await api.getReports({ ...reportParams(), cursor });
+      setReports((current) => [...current, ...response.data]);
+      setCursor(nextCursor(response));
+    } catch (error) {
+      toast.error("Erro ao carregar mais denúncias");
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
     fetchReports();
   }, [statusFilter]);
@@ -530,6 +560,18 @@ export default function ReportsPage() {
           </CardContent>
         </Card>
       )}
+      {cursor && (
+        <div className="flex justify-center mt-4">
+          <Button
+            variant="outline"
+            className="border-white/20"
+            onClick={loadMoreReports}
+            disabled={loadingMore}
+          >
+            {loadingMore ? "CARREGANDO..." : "CARREGAR MAIS"}
+          </Button>
+        </div>
+      )}
     </div>
   );
 }
@@ -0,0 +1,70 @@
+import os
+import sys
+from pathlib import Path
+
+import httpx
+import mongomock.collection
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "test_database")
+
+import server  # noqa: E402
+
+_find_one_and_update = mongomock.collection.Collection.find_one_and_update
+
+
+def _find_one_and_update_matched(self, filter, update, *args, **kwargs):
+    # mongomock re-applies the filter after the update, so a conditional flip such as
+    # {"status": "pending"} -> {"$set": {"status": "accepted"}} returns None. MongoDB returns
+    # the matched document; emulate that by resolving the match first.
+    doc = next(iter(self.find(filter, sort=kwargs.get("sort")).limit(1)), None)
+    if doc is None:
+        return _find_one_and_update(self, filter, update, *args, **kwargs) if kwargs.get("upsert") else None
+    return _find_one_and_update(self, {"_id": doc["_id"]}, update, *args, **kwargs)
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(autouse=True)
+def db(monkeypatch):
+    monkeypatch.setattr(mongomock.collection.Collection, "find_one_and_update", _find_one_and_update_matched)
+    database = AsyncMongoMockClient()["test_database"]
+    monkeypatch.setattr(server, "db", database)
+    server.ai_response_cache.clear()
+    server.ai_inflight.clear()
+    server.user_cache.clear()
+    for stats in (server.ai_cache_stats, server.job_stats):
+        for key in stats:
+            stats[key] = 0
+    return database
+
+
+@pytest.fixture
+async def admin(db):
+    user = {
+        "id": "admin-1",
+        "email": "admin@theadmins.com",
+        "username": "admin",
+        "role": server.UserRole.ADMIN,
+        "rank_points": 0,
+        "missions_completed": 0,
+        "reports_submitted": 0,
+        "created_at": "2024-01-01T00:00:00+00:00"
+    }
+    await db.users.insert_one(dict(user))
+    return user
+
+
+@pytest.fixture
+async def client(admin):
+    server.app.dependency_overrides[server.get_current_user] = lambda: admin
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        yield http
+    server.app.dependency_overrides.clear()
@@ -0,0 +1,118 @@
+import asyncio
+
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    # Stands in for the provider: records each call and streams its reply once released
+    calls = []
+    release = asyncio.Event()
+
+    async def stream_llm(user_id, content):
+        calls.append(content)
+        await release.wait()
+        for chunk in ("Ver", "ifique ", "o domínio"):
+            yield chunk
+
+    monkeypatch.setattr(server, "stream_llm", stream_llm)
+    return calls, release
+
+
+async def test_concurrent_identical_questions_share_one_upstream_call(upstream):
+    calls, release = upstream
+    first = asyncio.create_task(server.cached_ai_reply("u1", "Esse site é golpe?"))
+    second = asyncio.create_task(server.cached_ai_reply("u2", "  esse SITE é golpe "))
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await asyncio.gather(first, second) == ["Verifique o domínio", "Verifique o domínio"]
+    assert calls == ["Esse site é golpe?"]
+    assert server.ai_cache_stats["misses"] == 1
+    assert server.ai_cache_stats["coalesced"] == 1
+    assert server.ai_inflight == {}
+
+
+async def test_joined_reply_is_cached_and_served_whole(upstream):
+    calls, release = upstream
+    release.set()
+    assert [chunk async for chunk in server.ai_reply_chunks("u1", "oi")] == ["Ver", "ifique ", "o domínio"]
+
+    assert [chunk async for chunk in server.ai_reply_chunks("u2", "Oi!")] == ["Verifique o domínio"]
+    assert len(calls) == 1
+    assert server.ai_cache_stats["hits"] == 1
+
+
+async def test_late_caller_replays_chunks_already_streamed(monkeypatch):
+    gate = asyncio.Event()
+
+    async def stream_llm(user_id, content):
+        yield "a"
+        await gate.wait()
+        yield "b"
+
+    monkeypatch.setattr(server, "stream_llm", stream_llm)
+    early = server.ai_reply_chunks("u1", "q")
+    assert await early.__anext__() == "a"
+
+    late = asyncio.create_task(server.cached_ai_reply("u2", "q"))
+    await asyncio.sleep(0)
+    gate.set()
+
+    assert await early.__anext__() == "b"
+    assert await late == "ab"
+    await early.aclose()
+
+
+async def test_one_caller_leaving_does_not_cancel_the_others(upstream):
+    calls, release = upstream
+    leaving = asyncio.create_task(server.cached_ai_reply("u1", "q"))
+    staying = asyncio.create_task(server.cached_ai_reply("u2", "q"))
+    await asyncio.sleep(0)
+
+    leaving.cancel()
+    await asyncio.gather(leaving, return_exceptions=True)
+    release.set()
+
+    assert await staying == "Verifique o domínio"
+    assert len(calls) == 1
+
+
+async def test_last_caller_leaving_cancels_upstream(upstream):
+    calls, release = upstream
+    caller = asyncio.create_task(server.cached_ai_reply("u1", "q"))
+    await asyncio.sleep(0)
+    flight = server.ai_inflight[server.normalize_prompt("q")]
+
+    caller.cancel()
+    await asyncio.gather(caller, return_exceptions=True)
+    await asyncio.sleep(0)
+
+    assert flight["task"].cancelled()
+    assert server.ai_inflight == {}
+    assert server.normalize_prompt("q") not in server.ai_response_cache
+
+    # The next ask starts a fresh upstream call instead of joining the cancelled one
+    release.set()
+    assert await server.cached_ai_reply("u1", "q") == "Verifique o domínio"
+    assert len(calls) == 2
+
+
+async def test_upstream_error_reaches_every_caller_and_is_not_cached(monkeypatch):
+    async def stream_llm(user_id, content):
+        await asyncio.sleep(0)
+        raise RuntimeError("provider down")
+        yield
+
+    monkeypatch.setattr(server, "stream_llm", stream_llm)
+    results = await asyncio.gather(
+        server.cached_ai_reply("u1", "q"), server.cached_ai_reply("u2", "q"), return_exceptions=True
+    )
+
+    assert [type(result) for result in results] == [RuntimeError, RuntimeError]
+    assert server.ai_cache_stats["upstream_errors"] == 1
+    assert len(server.ai_response_cache) == 0
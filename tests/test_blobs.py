@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+from pymongo.errors import PyMongoError
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+
+
+@pytest.fixture(autouse=True)
+def blob_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(server, "BLOB_DIR", tmp_path / "blobs")
+    monkeypatch.setattr(server, "BLOB_STAGING_DIR", tmp_path / "blobs" / "staging")
+
+
+async def upload_tool(client, name, content):
+    response = await client.post(
+        "/api/tools/upload",
+        params={"name": name, "description": "d", "category": "osint"},
+        files={"file": (f"{name}.bin", content, "application/octet-stream")}
+    )
+    assert response.status_code == 200
+    return response.json()["id"]
+
+
+async def test_double_delete_releases_the_shared_blob_once(client, db, monkeypatch):
+    first = await upload_tool(client, "a", b"same bytes")
+    await upload_tool(client, "b", b"same bytes")
+    blob = await db.blobs.find_one({})
+    assert blob["refs"] == 2
+
+    release_blob = server.release_blob
+
+    async def slow_release(blob_id):
+        # Let the other request run between reading the tool and deleting it
+        await asyncio.sleep(0.01)
+        await release_blob(blob_id)
+
+    monkeypatch.setattr(server, "release_blob", slow_release)
+    responses = await asyncio.gather(
+        client.delete(f"/api/tools/{first}"), client.delete(f"/api/tools/{first}")
+    )
+
+    assert sorted(response.status_code for response in responses) == [200, 404]
+    assert (await db.blobs.find_one({"_id": blob["_id"]}))["refs"] == 1
+    monkeypatch.setattr(server, "BLOB_GC_GRACE", 0)
+    await server.gc_blobs()
+    assert server.blob_path(blob["_id"]).exists()
+
+
+UPLOADS = [
+    ("tools", "/api/tools/upload", {"name": "t", "description": "d", "category": "osint"}, "application/octet-stream"),
+    ("chat_messages", "/api/chat/upload-image", {}, "image/png"),
+    ("reports", "/api/reports/with-file", {"title": "t", "description": "d", "target_url": "https://x.example", "category": "phishing"}, "image/png"),
+]
+
+
+@pytest.mark.parametrize("collection,path,params,content_type", UPLOADS)
+async def test_failed_insert_gives_the_blob_reference_back(client, db, monkeypatch, collection, path, params, content_type):
+    collection_class = type(db[collection])
+    insert_one = collection_class.insert_one
+
+    async def failing_insert(self, doc, *args, **kwargs):
+        if self.name == collection:
+            raise PyMongoError("insert failed")
+        return await insert_one(self, doc, *args, **kwargs)
+
+    monkeypatch.setattr(collection_class, "insert_one", failing_insert)
+    with pytest.raises(PyMongoError):
+        await client.post(path, params=params, files={"file": ("f.png", PNG, content_type)})
+
+    blob = await db.blobs.find_one({})
+    assert blob["refs"] == 0
+    assert blob["released_at"]
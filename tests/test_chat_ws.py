@@ -0,0 +1,155 @@
+import asyncio
+import json
+import time
+
+import pytest
+from starlette.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeWebSocket:
+    """Stands in for a connection so the handler can be driven without a network stack."""
+
+    def __init__(self, expect=None, gate=None, on_send=None):
+        self.sent = []
+        self.accepted = False
+        self.close_code = None
+        self.received_all = asyncio.Event()
+        self.expect = expect
+        self.gate = gate
+        self.on_send = on_send
+        self.incoming = asyncio.Queue()
+
+    async def accept(self):
+        self.accepted = True
+
+    async def send_text(self, data):
+        if self.gate:
+            await self.gate.wait()
+        self.sent.append(json.loads(data))
+        if self.on_send:
+            self.on_send(self)
+        if len(self.sent) == self.expect:
+            self.received_all.set()
+
+    async def close(self, code=1000):
+        self.close_code = code
+
+    async def receive_text(self):
+        await self.incoming.get()
+        raise WebSocketDisconnect()
+
+    def disconnect(self):
+        self.incoming.put_nowait(None)
+
+    def ids(self):
+        return [event["data"]["id"] for event in self.sent]
+
+
+def chat_message(index):
+    return {
+        "id": f"c{index}", "user_id": "admin-1", "username": "admin", "role": "admin",
+        "content": f"mensagem {index}", "image_url": None, "is_ai": False,
+        "created_at": f"2024-01-01T00:00:{index:02d}+00:00"
+    }
+
+
+async def wait_until(predicate):
+    while not predicate():
+        await asyncio.sleep(0)
+
+
+@pytest.fixture(autouse=True)
+def clean_subscribers():
+    server.chat_subscribers.clear()
+    for key in server.chat_ws_stats:
+        server.chat_ws_stats[key] = 0
+    yield
+    server.chat_subscribers.clear()
+
+
+@pytest.fixture
+def ticket(admin):
+    return server.create_stream_ticket(admin["id"])
+
+
+async def test_resume_sends_missed_messages_once(db, ticket):
+    for index in range(1, 4):
+        await db.chat_messages.insert_one(chat_message(index))
+
+    def publish_during_resume(websocket):
+        # c3 is both in the resume query and published live once the connection is subscribed
+        if websocket.ids() == ["c2"]:
+            server.publish_chat_event("message", chat_message(3))
+            server.publish_chat_event("message", chat_message(4))
+
+    websocket = FakeWebSocket(expect=3, on_send=publish_during_resume)
+    handler = asyncio.create_task(server.chat_websocket(websocket, ticket, last_id="c1"))
+    await asyncio.wait_for(websocket.received_all.wait(), 1)
+    websocket.disconnect()
+    await handler
+
+    assert websocket.ids() == ["c2", "c3", "c4"]
+    assert not server.chat_subscribers
+    assert server.chat_ws_stats["connections"] == 0
+
+
+async def test_slow_consumer_is_closed_with_try_again_later(ticket, monkeypatch):
+    monkeypatch.setattr(server, "CHAT_WS_QUEUE_SIZE", 2)
+    gate = asyncio.Event()
+    websocket = FakeWebSocket(gate=gate)
+    handler = asyncio.create_task(server.chat_websocket(websocket, ticket))
+    await wait_until(lambda: server.chat_subscribers)
+
+    # The first message is taken by the sender, which then stalls on the socket; the rest overflow
+    for index in range(1, 6):
+        server.publish_chat_event("message", chat_message(index))
+        await asyncio.sleep(0)
+    assert not server.chat_subscribers
+    gate.set()
+    await asyncio.wait_for(handler, 1)
+
+    assert websocket.close_code == server.CHAT_WS_SLOW_CONSUMER_CODE == 1013
+    assert websocket.ids() == ["c1"]
+    assert server.chat_ws_stats["dropped_slow"] == 1
+
+
+def test_session_tokens_and_bad_tickets_are_refused():
+    client = TestClient(server.app)
+    session_token = server.create_token("admin-1", server.UserRole.ADMIN)
+
+    for ticket in (session_token, "not-a-jwt"):
+        with pytest.raises(WebSocketDisconnect) as closed:
+            with client.websocket_connect(f"/api/chat/ws?ticket={ticket}") as websocket:
+                websocket.receive_text()
+        assert closed.value.code == 1008
+    with pytest.raises(WebSocketDisconnect):
+        with client.websocket_connect("/api/chat/ws") as websocket:
+            websocket.receive_text()
+
+
+async def test_thousand_connections_all_receive_every_message(client, ticket):
+    connections, messages = 1000, 10
+    websockets = [FakeWebSocket(expect=messages) for _ in range(connections)]
+    handlers = [asyncio.create_task(server.chat_websocket(websocket, ticket)) for websocket in websockets]
+    await wait_until(lambda: len(server.chat_subscribers) == connections)
+
+    started = time.monotonic()
+    sent = []
+    for index in range(messages):
+        response = await client.post("/api/chat/send", json={"content": f"mensagem {index}"})
+        sent.append(response.json()["id"])
+    await asyncio.wait_for(asyncio.gather(*(websocket.received_all.wait() for websocket in websockets)), 10)
+    elapsed = time.monotonic() - started
+
+    for websocket in websockets:
+        websocket.disconnect()
+    await asyncio.gather(*handlers)
+
+    assert all(websocket.ids() == sent for websocket in websockets)
+    assert server.chat_ws_stats == {"connections": 0, "published": messages, "dropped_slow": 0}
+    assert elapsed < 5, f"{connections} connections x {messages} messages took {elapsed:.2f}s"
@@ -0,0 +1,108 @@
+import os
+import uuid
+
+import pytest
+from motor.motor_asyncio import AsyncIOMotorClient
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+# A real server to explain against, e.g. TEST_MONGO_URL=mongodb://localhost:27017; a scratch
+# database is created and dropped. mongomock cannot explain, so without it only the static check runs.
+TEST_MONGO_URL = os.environ.get("TEST_MONGO_URL")
+
+
+def _flipped(keys):
+    return [(field, -direction) for field, direction in keys]
+
+
+def covering_index(collection, query, sort):
+    # Equality fields first, then the sort (in either direction): the shape every hot query is built for
+    equality = {field for field in query if not field.startswith("$")}
+    sort = sort or []
+    for index_collection, keys, _ in server.MONGO_INDEXES:
+        if index_collection != collection or len(keys) < len(equality) + len(sort):
+            continue
+        if {field for field, _ in keys[:len(equality)]} != equality:
+            continue
+        sort_keys = keys[len(equality):len(equality) + len(sort)]
+        if not sort or sort_keys == sort or sort_keys == _flipped(sort):
+            return keys
+    return None
+
+
+def unindexed_report(entries):
+    return "unindexed hot queries:\n" + "\n".join(
+        f"  {entry['query']} ({entry['collection']}): {' -> '.join(entry['stages'])}" for entry in entries
+    )
+
+
+def test_every_hot_query_has_a_declared_index():
+    missing = [
+        {"query": name, "collection": collection, "stages": ["no covering index in MONGO_INDEXES"]}
+        for name, collection, query, sort in server.HOT_QUERIES
+        if covering_index(collection, query, sort) is None
+    ]
+
+    assert not missing, unindexed_report(missing)
+
+
+@pytest.fixture
+async def live_db(monkeypatch):
+    if not TEST_MONGO_URL:
+        pytest.skip("TEST_MONGO_URL not set")
+    client = AsyncIOMotorClient(TEST_MONGO_URL, serverSelectionTimeoutMS=2000)
+    database = client[f"test_indexes_{uuid.uuid4().hex[:8]}"]
+    monkeypatch.setattr(server, "db", database)
+    yield database
+    await client.drop_database(database.name)
+    client.close()
+
+
+async def test_explain_finds_no_collection_scans(live_db):
+    await server.ensure_indexes()
+
+    report = await server.explain_hot_queries()
+
+    assert len(report) == len(server.HOT_QUERIES)
+    assert all(entry["indexed"] for entry in report), unindexed_report(
+        [entry for entry in report if not entry["indexed"]]
+    )
+
+
+@pytest.fixture
+async def indexed(db):
+    await server.ensure_indexes()
+
+
+async def test_rename_to_a_taken_username_is_refused(client, db, indexed):
+    await db.users.insert_one({"id": "u2", "email": "outro@theadmins.com", "username": "outro", "role": "externo"})
+
+    response = await client.put("/api/users/u2", json={"username": "admin"})
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Username already taken"
+    assert (await db.users.find_one({"id": "u2"}))["username"] == "outro"
+
+
+@pytest.mark.parametrize("competitor,detail", [
+    ({"email": "novo@theadmins.com", "username": "outro"}, "Email already registered"),
+    ({"email": "outro@theadmins.com", "username": "novo"}, "Username already taken"),
+])
+async def test_registration_that_loses_the_race_is_refused(client, db, indexed, monkeypatch, competitor, detail):
+    run_bcrypt = server.run_bcrypt
+
+    async def racing_bcrypt(*args):
+        # A concurrent registration is inserted while this one is hashing its password
+        await db.users.insert_one({"id": "u2", "role": "externo", **competitor})
+        return await run_bcrypt(*args)
+
+    monkeypatch.setattr(server, "run_bcrypt", racing_bcrypt)
+    response = await client.post(
+        "/api/auth/register", json={"email": "novo@theadmins.com", "username": "novo", "password": "segredo"}
+    )
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == detail
+    assert await db.users.count_documents({}) == 2
@@ -0,0 +1,129 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from pymongo.errors import PyMongoError
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def indexed(db):
+    # The unique jobs.id and notifications.id indexes are what make relays and notifications idempotent
+    await server.ensure_indexes()
+
+
+@pytest.fixture
+async def in_progress_mission(db, admin):
+    doc = {
+        "id": "m1", "title": "Loja falsa", "description": "d", "target_url": "https://loja.example",
+        "category": "phishing", "priority": "medium", "status": "in_progress", "site_status": 200,
+        "assigned_to": admin["id"], "assigned_username": admin["username"], "created_by": admin["id"],
+        "created_at": "2024-01-01T00:00:00+00:00"
+    }
+    await db.missions.insert_one(dict(doc))
+    return doc
+
+
+@pytest.fixture
+def site_down(monkeypatch):
+    async def check_site_status(url):
+        return 404
+
+    monkeypatch.setattr(server, "check_site_status", check_site_status)
+
+
+async def test_redelivered_mission_job_rewards_once(db, admin, indexed):
+    job_id = await server.enqueue_job(
+        "mission_completed", {"user_id": admin["id"], "mission_id": "m1", "mission_title": "Loja falsa"}
+    )
+    job = await server.claim_job()
+
+    await server.handle_mission_completed(job)
+    await server.handle_mission_completed(job)
+
+    user = await db.users.find_one({"id": admin["id"]})
+    assert (user["rank_points"], user["missions_completed"]) == (100, 1)
+    assert user["applied_jobs"] == [job_id]
+    assert await db.notifications.count_documents({"user_id": admin["id"], "type": "mission"}) == 1
+
+
+async def test_expired_lease_is_redelivered_and_the_stale_worker_cannot_ack(db, admin, indexed):
+    await server.enqueue_job("report_submitted", {"user_id": admin["id"], "report_id": "r1"})
+    first = await server.claim_job()
+    await server.handle_report_submitted(first)
+    # The first worker dies before acknowledging; its lease runs out
+    past = (datetime.now(timezone.utc) - timedelta(seconds=1)).isoformat()
+    await db.jobs.update_one({"id": first["id"]}, {"$set": {"locked_until": past}})
+
+    second = await server.claim_job()
+    assert (second["id"], second["attempts"]) == (first["id"], 2)
+    await server.run_job(second)
+    await server.run_job({**first, "locked_until": past})
+
+    job = await db.jobs.find_one({"id": first["id"]})
+    user = await db.users.find_one({"id": admin["id"]})
+    assert job["status"] == "done"
+    assert job["locked_until"] is None
+    assert (user["rank_points"], user["reports_submitted"]) == (10, 1)
+
+
+async def test_completion_is_recorded_with_its_job_even_if_the_relay_fails(
+    client, db, admin, indexed, in_progress_mission, site_down, monkeypatch
+):
+    async def broken_enqueue(*args, **kwargs):
+        raise PyMongoError("jobs unavailable")
+
+    enqueue_job = server.enqueue_job
+    monkeypatch.setattr(server, "enqueue_job", broken_enqueue)
+    response = await client.post("/api/missions/m1/complete")
+    monkeypatch.setattr(server, "enqueue_job", enqueue_job)
+
+    assert response.status_code == 200
+    assert await db.jobs.count_documents({}) == 0
+    outbox = (await db.missions.find_one({"id": "m1"}))["outbox"]
+    assert [entry["type"] for entry in outbox] == ["mission_completed"]
+
+    await server.drain_outbox()
+    await server.drain_outbox()
+
+    jobs = await db.jobs.find({}).to_list(None)
+    assert [job["id"] for job in jobs] == [outbox[0]["id"]]
+    assert (await db.missions.find_one({"id": "m1"}))["outbox"] == []
+
+
+async def test_relaying_an_outbox_entry_twice_creates_one_job(db, indexed):
+    entry = server.outbox_entry("report_submitted", {"user_id": "u1", "report_id": "r1"})
+    await db.reports.insert_one({"id": "r1", "outbox": [entry]})
+
+    await server.relay_outbox("reports", "r1", [entry])
+    await server.relay_outbox("reports", "r1", [entry])
+
+    assert await db.jobs.count_documents({"id": entry["id"]}) == 1
+    assert server.job_stats["enqueued"] == 1
+
+
+async def test_double_complete_enqueues_one_job(client, db, indexed, in_progress_mission, site_down):
+    first = await client.post("/api/missions/m1/complete")
+    second = await client.post("/api/missions/m1/complete")
+
+    assert (first.status_code, second.status_code) == (200, 400)
+    assert await db.jobs.count_documents({"type": "mission_completed"}) == 1
+
+
+async def test_completion_counts_from_the_mission_as_it_was_when_flipped(
+    client, db, indexed, in_progress_mission, monkeypatch
+):
+    await server.reconcile_counters()
+
+    async def slow_probe(url):
+        # The sweep finds the site down and records it while this probe is still running
+        before = await db.missions.find_one_and_update({"id": "m1"}, {"$set": {"site_status": 404}})
+        await server.increment_counters(server.counter_delta("missions", before, {**before, "site_status": 404}))
+        return 404
+
+    monkeypatch.setattr(server, "check_site_status", slow_probe)
+    assert (await client.post("/api/missions/m1/complete")).status_code == 200
+
+    assert await server.reconcile_counters() == []
@@ -0,0 +1,75 @@
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+LIST_ENDPOINTS = [
+    ("/api/users", {}, server.UserResponse),
+    ("/api/missions", {}, server.MissionResponse),
+    ("/api/missions", {"fields": "summary"}, server.MissionSummary),
+    ("/api/reports", {}, server.ReportResponse),
+    ("/api/reports", {"fields": "summary"}, server.ReportSummary),
+    ("/api/tools", {}, server.ToolResponse),
+    ("/api/chat/messages", {}, server.ChatResponse),
+]
+
+
+@pytest.fixture
+async def seeded(client, db, monkeypatch):
+    async def site_online(url):
+        return 200
+
+    monkeypatch.setattr(server, "check_site_status", site_online)
+    mission = {"title": "Loja falsa", "description": "Pix", "target_url": "https://loja.example", "category": "phishing"}
+    assert (await client.post("/api/missions", json=mission)).status_code == 200
+    report = {**mission, "evidence": "print"}
+    assert (await client.post("/api/reports", json=report)).status_code == 200
+    tool = {"name": "whois", "description": "Lookup", "category": "osint", "url": "https://whois.example"}
+    assert (await client.post("/api/tools", json=tool)).status_code == 200
+    assert (await client.post("/api/chat/send", json={"content": "bom dia"})).status_code == 200
+
+    # Documents written before the optional fields existed
+    await db.users.insert_one({
+        "id": "legacy-user", "email": "old@theadmins.com", "username": "old", "role": "externo",
+        "created_at": "2023-01-01T00:00:00+00:00"
+    })
+    await db.missions.insert_one({
+        "id": "legacy-mission", "title": "Antiga", "description": "d", "target_url": "https://old.example",
+        "category": "phishing", "priority": "low", "status": "pending", "created_by": "admin-1",
+        "created_at": "2023-01-01T00:00:00+00:00"
+    })
+    await db.reports.insert_one({
+        "id": "legacy-report", "title": "Antiga", "description": "d", "target_url": "https://old.example",
+        "category": "phishing", "status": "pending", "submitted_by": "admin-1", "submitted_username": "admin",
+        "created_at": "2023-01-01T00:00:00+00:00"
+    })
+    await db.tools.insert_one({
+        "id": "legacy-tool", "name": "nmap", "description": "Scanner", "category": "recon", "is_file": False,
+        "created_by": "admin-1", "created_at": "2023-01-01T00:00:00+00:00"
+    })
+    await db.chat_messages.insert_one({
+        "id": "legacy-message", "user_id": "admin-1", "username": "admin", "content": "oi", "is_ai": False,
+        "created_at": "2023-01-01T00:00:00+00:00"
+    })
+
+
+@pytest.mark.parametrize("path,params,model", LIST_ENDPOINTS)
+async def test_fast_path_matches_model_validation(seeded, client, monkeypatch, path, params, model):
+    monkeypatch.setattr(server, "VALIDATE_LIST_RESPONSES", False)
+    fast = await client.get(path, params=params)
+    monkeypatch.setattr(server, "VALIDATE_LIST_RESPONSES", True)
+    validated = await client.get(path, params=params)
+
+    assert fast.status_code == validated.status_code == 200
+    assert len(validated.json()) >= 2
+    assert fast.json() == validated.json()
+    # Every row carries exactly the model's fields, legacy documents included
+    assert all(set(row) == set(model.model_fields) for row in validated.json())
+
+
+@pytest.mark.parametrize("path,params,model", LIST_ENDPOINTS)
+async def test_list_rows_leave_out_internal_fields(seeded, client, path, params, model):
+    rows = (await client.get(path, params=params)).json()
+
+    assert not any({"_id", "password", "outbox", "blob_id", "applied_jobs"} & set(row) for row in rows)
@@ -0,0 +1,58 @@
+import pytest
+from starlette.requests import Request
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(autouse=True)
+def fresh_limits(monkeypatch):
+    monkeypatch.setattr(server, "window_store", server.MemoryWindowStore())
+    monkeypatch.setattr(server, "TRUSTED_PROXY_HOPS", 1)
+    for limiter in (server.login_limiter, server.login_account_limiter):
+        limiter.buckets.clear()
+
+
+def request_with(forwarded=None, peer="10.0.0.1"):
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded is not None else []
+    return Request({"type": "http", "headers": headers, "client": (peer, 1234)})
+
+
+async def login(client, email, forwarded):
+    response = await client.post(
+        "/api/auth/login", json={"email": email, "password": "wrong"}, headers={"X-Forwarded-For": forwarded}
+    )
+    return response.status_code
+
+
+def test_client_ip_is_the_entry_appended_by_the_trusted_proxy():
+    assert server.client_ip(request_with("6.6.6.6, 203.0.113.7")) == "203.0.113.7"
+
+
+def test_client_ip_falls_back_to_the_peer_without_a_complete_header(monkeypatch):
+    assert server.client_ip(request_with()) == "10.0.0.1"
+    monkeypatch.setattr(server, "TRUSTED_PROXY_HOPS", 2)
+    assert server.client_ip(request_with("203.0.113.7")) == "10.0.0.1"
+    monkeypatch.setattr(server, "TRUSTED_PROXY_HOPS", 0)
+    assert server.client_ip(request_with("203.0.113.7")) == "10.0.0.1"
+
+
+async def test_forged_leftmost_entries_do_not_reset_the_address_limit(client):
+    statuses = [await login(client, "alvo@theadmins.com", f"198.51.100.{i}, 203.0.113.7") for i in range(6)]
+
+    assert statuses == [401] * 5 + [429]
+
+
+async def test_rotating_addresses_still_hit_the_account_limit(client):
+    statuses = [await login(client, " Alvo@TheAdmins.com", f"198.51.100.{i}") for i in range(11)]
+
+    assert statuses == [401] * 10 + [429]
+
+
+async def test_other_accounts_from_the_same_address_are_not_throttled(client):
+    for _ in range(5):
+        await login(client, "alvo@theadmins.com", "203.0.113.7")
+
+    assert await login(client, "alvo@theadmins.com", "203.0.113.7") == 429
+    assert await login(client, "outro@theadmins.com", "203.0.113.7") == 401
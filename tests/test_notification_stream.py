@@ -0,0 +1,167 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeRequest:
+    def __init__(self):
+        self.disconnected = False
+
+    async def is_disconnected(self):
+        return self.disconnected
+
+
+def parse_event(chunk):
+    fields = dict(line.split(": ", 1) for line in chunk.strip().split("\n"))
+    if "data" in fields:
+        fields["data"] = json.loads(fields["data"])
+    return fields
+
+
+async def wait_until(predicate):
+    while not predicate():
+        await asyncio.sleep(0)
+
+
+async def next_event(stream):
+    return parse_event(await asyncio.wait_for(stream.__anext__(), 1))
+
+
+def notification(index, user_id="admin-1"):
+    return {
+        **server.build_notification(user_id, f"Aviso {index}", "m"),
+        "id": f"n{index}", "created_at": f"2024-01-01T00:00:{index:02d}+00:00"
+    }
+
+
+@pytest.fixture(autouse=True)
+def clean_subscribers():
+    server.notification_subscribers.clear()
+    for key in server.notification_sse_stats:
+        server.notification_sse_stats[key] = 0
+    yield
+    server.notification_subscribers.clear()
+
+
+async def test_last_event_id_replays_missed_notifications_once(db, admin):
+    for index in range(1, 4):
+        await db.notifications.insert_one(notification(index))
+    stream = server.notification_event_stream(FakeRequest(), admin["id"], "n1")
+
+    assert parse_event(await stream.__anext__()) == {"retry": str(server.NOTIFICATIONS_SSE_RETRY_MS)}
+    assert (await next_event(stream))["id"] == "n2"
+    # n3 is published live while the replay is still going, so it is queued and replayed
+    await server.publish_notifications(admin["id"], [notification(3)])
+    assert (await next_event(stream))["id"] == "n3"
+    assert await next_event(stream) == {"event": "unread", "data": {"unread": 3}}
+    assert await next_event(stream) == {"event": "unread", "data": {"unread": 3}}
+
+    await server.create_notification(admin["id"], "Nova", "m")
+    event = await next_event(stream)
+    assert (event["event"], event["data"]["title"]) == ("notification", "Nova")
+    assert await next_event(stream) == {"event": "unread", "data": {"unread": 4}}
+    await stream.aclose()
+
+    assert not server.notification_subscribers
+    assert server.notification_sse_stats["connections"] == 0
+
+
+async def test_marking_read_pushes_the_unread_count(client, db, admin):
+    for index in range(1, 3):
+        await db.notifications.insert_one(notification(index))
+    stream = server.notification_event_stream(FakeRequest(), admin["id"], None)
+    await stream.__anext__()
+    assert await next_event(stream) == {"event": "unread", "data": {"unread": 2}}
+
+    await client.post("/api/notifications/mark-read/n1")
+    assert await next_event(stream) == {"event": "unread", "data": {"unread": 1}}
+    await client.post("/api/notifications/mark-all-read")
+    assert await next_event(stream) == {"event": "unread", "data": {"unread": 0}}
+    await stream.aclose()
+
+
+async def test_stream_ends_when_the_client_disconnects(admin, monkeypatch):
+    monkeypatch.setattr(server, "NOTIFICATIONS_SSE_HEARTBEAT", 0.01)
+    request = FakeRequest()
+    stream = server.notification_event_stream(request, admin["id"], None)
+    await stream.__anext__()
+    await stream.__anext__()
+
+    assert await asyncio.wait_for(stream.__anext__(), 1) == ": heartbeat\n\n"
+    request.disconnected = True
+    with pytest.raises(StopAsyncIteration):
+        await asyncio.wait_for(stream.__anext__(), 1)
+    assert not server.notification_subscribers
+
+
+async def test_tickets_and_session_tokens_are_not_interchangeable(admin):
+    ticket = server.create_stream_ticket(admin["id"])
+    session_token = server.create_token(admin["id"], admin["role"])
+
+    with pytest.raises(HTTPException):
+        await server.authenticate_token(ticket)
+    with pytest.raises(HTTPException):
+        await server.authenticate_token(session_token, purpose="stream")
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://test") as http:
+        as_session = await http.get("/api/notifications", headers={"Authorization": f"Bearer {ticket}"})
+        as_ticket = await http.get("/api/notifications/stream", params={"ticket": session_token})
+        with_session = await http.get("/api/notifications", headers={"Authorization": f"Bearer {session_token}"})
+
+    assert (as_session.status_code, as_ticket.status_code, with_session.status_code) == (401, 401, 200)
+
+
+async def test_push_costs_a_fraction_of_polling_at_5000_users(db, monkeypatch):
+    users, notified = 5000, 50
+    user_ids = [f"u{index}" for index in range(users)]
+    collection_class = type(db.notifications)
+    queries = {"count": 0}
+    for method in ("find", "count_documents"):
+        original = getattr(collection_class, method)
+
+        def counted(self, *args, _original=original, **kwargs):
+            if self.name == "notifications":
+                queries["count"] += 1
+            return _original(self, *args, **kwargs)
+
+        monkeypatch.setattr(collection_class, method, counted)
+
+    # Every user has an open stream, parked waiting for its next item
+    streams = [server.notification_event_stream(FakeRequest(), user_id, None) for user_id in user_ids]
+    for stream in streams:
+        await stream.__anext__()
+        await stream.__anext__()
+    waiting = [asyncio.create_task(stream.__anext__()) for stream in streams]
+    await asyncio.sleep(0)
+
+    # One polling interval in which 1% of the users get a notification
+    queries["count"] = 0
+    for user_id in user_ids[:notified]:
+        await server.create_notification(user_id, "Nova", "m")
+    push_queries = queries["count"]
+    await asyncio.wait_for(wait_until(lambda: sum(task.done() for task in waiting) == notified), 5)
+    delivered = [task for task in waiting if task.done()]
+    push_bytes = sum(len(task.result()) for task in delivered)
+
+    queries["count"] = 0
+    poll_bytes = 0
+    for user_id in user_ids:
+        response = await server.get_notifications({"id": user_id})
+        poll_bytes += len(response.body)
+    poll_queries = queries["count"]
+
+    for task in waiting:
+        task.cancel()
+    await asyncio.gather(*waiting, return_exceptions=True)
+    for stream in streams:
+        await stream.aclose()
+
+    assert len(delivered) == notified
+    assert (push_queries, poll_queries) == (notified, users)
+    assert push_bytes < poll_bytes
@@ -0,0 +1,83 @@
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+
+def mission(doc_id, created_at, status="pending"):
+    return {
+        "id": doc_id, "title": doc_id, "description": "d", "target_url": f"https://{doc_id}.example",
+        "category": "phishing", "priority": "medium", "status": status, "site_status": 200,
+        "created_by": "admin-1", "created_at": created_at
+    }
+
+
+@pytest.fixture
+async def missions(db):
+    # Several missions share a created_at so the id tie-breaker decides their order
+    docs = [
+        mission("m1", "2024-01-01T00:00:00+00:00"),
+        mission("m2", "2024-01-02T00:00:00+00:00", status="completed"),
+        mission("m3", "2024-01-02T00:00:00+00:00"),
+        mission("m4", "2024-01-02T00:00:00+00:00", status="completed"),
+        mission("m5", "2024-01-03T00:00:00+00:00"),
+    ]
+    await db.missions.insert_many([dict(doc) for doc in docs])
+    return docs
+
+
+async def walk(client, path, params):
+    pages = []
+    cursor = None
+    while True:
+        response = await client.get(path, params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        pages.append([row["id"] for row in response.json()])
+        cursor = response.headers.get(server.NEXT_CURSOR_HEADER)
+        if cursor is None:
+            return pages
+
+
+async def test_cursor_walks_every_document_once_in_order(client, missions):
+    pages = await walk(client, "/api/missions", {"limit": 2})
+
+    assert pages == [["m5", "m4"], ["m3", "m2"], ["m1"]]
+
+
+async def test_last_full_page_has_no_cursor(client, missions):
+    response = await client.get("/api/missions", params={"limit": 5})
+
+    assert len(response.json()) == 5
+    assert server.NEXT_CURSOR_HEADER not in response.headers
+
+
+async def test_filters_apply_to_every_page(client, missions):
+    pages = await walk(client, "/api/missions", {"limit": 1, "status": "completed"})
+
+    assert pages == [["m4"], ["m2"]]
+
+
+async def test_documents_created_between_pages_do_not_shift_the_walk(client, db, missions):
+    first = await client.get("/api/missions", params={"limit": 2})
+    await db.missions.insert_one(mission("m6", "2024-01-04T00:00:00+00:00"))
+
+    rest = await client.get(
+        "/api/missions", params={"limit": 10, "cursor": first.headers[server.NEXT_CURSOR_HEADER]}
+    )
+
+    assert [row["id"] for row in rest.json()] == ["m3", "m2", "m1"]
+
+
+def test_cursor_round_trips():
+    doc = {"created_at": "2024-01-02T00:00:00+00:00", "id": "m3"}
+
+    assert server.decode_cursor(server.encode_cursor(doc)) == (doc["created_at"], doc["id"])
+
+
+@pytest.mark.parametrize("cursor", ["not-base64!", "bnVsbA", "WzEsIDJd"])
+async def test_malformed_cursor_is_rejected(client, missions, cursor):
+    response = await client.get("/api/missions", params={"cursor": cursor})
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
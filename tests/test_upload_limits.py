@@ -0,0 +1,65 @@
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+LARGE_EVIDENCE = "log line\n" * (200 * 1024)  # ~1.8 MiB of pasted text
+
+
+@pytest.fixture(autouse=True)
+def small_limits(tmp_path, monkeypatch):
+    monkeypatch.setitem(server.UPLOAD_BODY_LIMITS, "/api/chat/upload-image", 1000)
+    monkeypatch.setattr(server, "UPLOAD_FORM_OVERHEAD", 100)
+    monkeypatch.setattr(server, "BLOB_DIR", tmp_path / "blobs")
+    monkeypatch.setattr(server, "BLOB_STAGING_DIR", tmp_path / "blobs" / "staging")
+
+
+@pytest.fixture
+def site_online(monkeypatch):
+    async def check_site_status(url):
+        return 200
+
+    monkeypatch.setattr(server, "check_site_status", check_site_status)
+
+
+async def test_json_bodies_with_long_evidence_are_not_capped(client, site_online):
+    mission = {
+        "title": "Logs", "description": "d", "target_url": "https://x.example", "category": "phishing",
+        "evidence": LARGE_EVIDENCE
+    }
+
+    assert (await client.post("/api/missions", json=mission)).status_code == 200
+    assert (await client.post("/api/reports", json=mission)).status_code == 200
+
+
+async def test_declared_oversized_upload_is_refused_before_reading(client):
+    response = await client.post("/api/chat/upload-image", files={"file": ("a.png", b"x" * 5000, "image/png")})
+
+    assert response.status_code == 413
+    assert response.json()["detail"] == "Request body too large (max 1100 bytes)"
+    assert not server.BLOB_STAGING_DIR.exists()
+
+
+async def test_streamed_upload_is_cut_off_at_the_limit(client):
+    async def body():
+        # A well-formed part with no Content-Length, so only the running count can stop it
+        yield b'--zz\r\nContent-Disposition: form-data; name="file"; filename="a.png"\r\n'
+        yield b"Content-Type: image/png\r\n\r\n"
+        for _ in range(10):
+            yield b"y" * 500
+        yield b"\r\n--zz--\r\n"
+
+    response = await client.post(
+        "/api/chat/upload-image", content=body(), headers={"content-type": "multipart/form-data; boundary=zz"}
+    )
+
+    assert response.status_code == 413
+
+
+async def test_upload_within_the_limit_is_accepted(client):
+    png = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+
+    response = await client.post("/api/chat/upload-image", files={"file": ("a.png", png, "image/png")})
+
+    assert response.status_code == 200